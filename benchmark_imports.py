@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+import time
+
+# Modules a non-rendering command imports; none of them may pull in Pillow, NumPy or requests
+MODULES = [
+    "card_collection",
+    "card_scrub",
+    "card_search",
+    "catalog_snapshot",
+    "collection_stats",
+    "foil_effect",
+    "create_collection_per_color",
+    "load_images_by_ravensburger",
+]
+HEAVY_MODULES = ["PIL", "numpy", "requests"]
+RUNS = 10
+TARGET_MS = 100
+
+
+def cold_start_ms(code, runs=RUNS):
+    """Best wall time of a fresh interpreter running code, in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def loaded_heavy_modules(module):
+    """Heavy packages present in sys.modules after importing module."""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout.strip()
+    return output.split(",") if output else []
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark_imports.py - cold-start cost of importing each module, on top of the bare interpreter
+    baseline_ms = cold_start_ms("pass")
+    print(f"Interpreter baseline: {baseline_ms:.1f} ms (best of {RUNS})")
+    for module in MODULES:
+        import_ms = cold_start_ms(f"import {module}") - baseline_ms
+        heavy = loaded_heavy_modules(module)
+        status = "ok" if import_ms < TARGET_MS and not heavy else "SLOW"
+        print(f"{module:<30} +{import_ms:6.1f} ms  heavy imports: {', '.join(heavy) or 'none':<20} {status}")
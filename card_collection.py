@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+
+def csv_to_json(csv_file_path):
+    """Convert CSV data to JSON format."""
+    import csv
+
+    try:
+        with open(csv_file_path, 'r', encoding='utf-8') as csv_file:
+            header_line = csv_file.readline()
+            headers = [h.strip().replace('\ufeff', '') for h in header_line.split(',')]
+            csv_file.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(csv_file.read(2048), delimiters=',;\t|')
+            except csv.Error:
+                print("Warning: Could not automatically determine CSV delimiter. Assuming comma.")
+                dialect = 'excel'
+            csv_file.seek(0)
+            csv_reader = csv.DictReader(csv_file, dialect=dialect)
+            csv_reader.fieldnames = [key.strip().replace('\ufeff', '') for key in csv_reader.fieldnames or headers]
+            return list(csv_reader)
+    except FileNotFoundError:
+        print(f"Error: CSV file not found at {csv_file_path}")
+        return []
+    except Exception as e:
+        print(f"Error reading CSV file {csv_file_path}: {e}")
+        return []
+
+
+# --- REVISED Helper function to generate standardized keys ---
+def generate_card_key(set_code, card_num_raw_from_csv, debug=False):
+    """
+    Generates a standardized card key matching the expected FILENAME format.
+    Handles main chapter padding/variants and special set number stripping/padding.
+    """
+    import re
+
+    card_num_raw = str(card_num_raw_from_csv).strip()  # Ensure string
+
+    # Regex to find numeric part and optional alphabetic suffix
+    # Allows optional prefix (like 'P') before the number
+    match = re.match(r'^[a-zA-Z]*(\d+)([a-zA-Z]*)$', card_num_raw)
+
+    if match:
+        num_part = match.group(1)
+        variant_part = match.group(2).lower()
+        # Pad numeric part to 3 digits (adjust if filename convention differs)
+        padded_num = num_part.zfill(3)
+        # Return in filename format: padded number + variant
+        key = padded_num + variant_part
+        # if debug: print(f"Generated key: {key} from set={set_code}, raw={card_num_raw}")
+        return key
+    else:
+        # Fallback for formats not matching the pattern (e.g., "1TFC EN 1" ?)
+        # Or purely non-numeric IDs if they exist.
+        # We might need specific handling for '1TFC EN 1' style if that's common.
+        # For now, return raw as a last resort, but warn.
+        if debug: print(f"Warning: Could not parse card number '{card_num_raw}' for set {set_code} into standard format. Using raw value '{card_num_raw}' as key.")
+        return card_num_raw
+
+
+# --- End Helper function ---
+
+
+def load_my_card_collection_from_chapters(csv_file_path='export.csv', debug=False):
+    """
+    Load the card collection, generating standardized keys based on filename convention.
+    Returns an empty dict if the export cannot be read.
+    """
+    json_objects = csv_to_json(csv_file_path)
+    if not json_objects:
+        print(f"Failed to load data from {csv_file_path}.")
+        return {}
+
+    dict_all_chapters = defaultdict(dict)
+    expected_keys = ["Name", "Normal", "Foil", "Color", "Rarity", "Set", "Card Number"]
+
+    if json_objects and not all(key in json_objects[0] for key in expected_keys):
+        print(f"Error: CSV missing one or more expected columns: {expected_keys}")
+        print(f"Found columns: {list(json_objects[0].keys())}")
+        return {}
+
+    loaded_keys_sample = defaultdict(list)  # For debugging
+
+    for entry in json_objects:
+        try:
+            # (Color, Rarity parsing remain the same)
+            color_str = entry.get("Color", "").strip()
+            colors = color_str.split(" ") if color_str else []
+            colors = [c for c in colors if c]
+            rarity = entry.get("Rarity", "").strip().upper()
+
+            card_dict = {
+                "name": entry.get("Name", "Unknown").strip(),
+                "normal": entry.get("Normal", "0").strip() or "0",
+                "foil": entry.get("Foil", "0").strip() or "0",
+                "color": colors,
+                "rarity": rarity,
+                "multicolor": len(colors) > 1,
+            }
+
+            card_num_raw = entry.get("Card Number", "").strip()
+            set_code = entry.get("Set", "").strip()
+
+            # *** Use the revised helper function to generate the key ***
+            card_key = generate_card_key(set_code, card_num_raw, debug)
+
+            if not card_key: continue
+
+            # Store using the standardized key
+            dict_all_chapters[set_code][card_key] = card_dict
+            if debug and len(loaded_keys_sample[set_code]) < 5:  # Log a few keys per set
+                loaded_keys_sample[set_code].append(card_key)
+
+        except Exception as e:
+            if debug: print(f"Error processing row: {entry}\nError details: {e}")
+            continue
+
+    if debug:
+        print("Sample keys loaded into the collection:")
+        for set_code, keys in loaded_keys_sample.items():
+            print(f"  Set {set_code}: {keys}")
+
+    return dict_all_chapters
+
+
+def calculate_multicolor_assignments(collection, debug=False):
+    """Calculates assignments ONLY for NON-ENCHANTED multicolor cards. Returns {(chapter, card_key): color}."""
+    multicolor_assignments = {}
+    cards_by_combo = defaultdict(list)
+    non_ee_multi_count = 0
+
+    for chapter, cards in collection.items():
+        for card_key, card_info in cards.items():
+            is_multi = card_info.get("multicolor", False)
+            rarity = card_info.get("rarity", "")
+
+            # Skip if not multicolor OR if it IS Enchanted
+            # Ensure check matches the value stored (e.g., "ENCHANTED" or "EE")
+            # Using "ENCHANTED" based on previous filter logic, adjust if needed
+            if not is_multi or rarity == "ENCHANTED":
+                continue
+
+            non_ee_multi_count += 1
+            colors = card_info.get("color", [])
+            if len(colors) < 2: continue
+
+            color_pair = tuple(sorted([c.lower() for c in colors]))
+            combo_key = (chapter, color_pair)
+            cards_by_combo[combo_key].append(card_key)
+
+    if debug: print(f"Found {non_ee_multi_count} non-Enchanted multicolor cards to assign.")
+
+    # Assign cards (code remains the same)
+    total_assigned = 0
+    for (chapter, color_pair), card_keys in cards_by_combo.items():
+        sorted_card_keys = sorted(card_keys)
+        num_cards = len(sorted_card_keys)
+        split_point = (num_cards + 1) // 2
+        color1, color2 = color_pair
+        for i, card_key in enumerate(sorted_card_keys):
+            assignment_key = (chapter, card_key)
+            if i < split_point:
+                multicolor_assignments[assignment_key] = color1
+            else:
+                multicolor_assignments[assignment_key] = color2
+            total_assigned += 1
+        # Optional log per combo
+        if debug and num_cards > 0: print(f"Assigning {chapter} {color_pair}: {split_point} to '{color1}', {num_cards - split_point} to '{color2}'")
+    if debug: print(f"Finished assignment. Total assignments stored: {total_assigned}")
+    return multicolor_assignments
+
+
+class CardCollection:
+    """
+    A dreamborn.ink collection: cards by set code and standardized card key,
+    plus the color each non-Enchanted multicolor card is shown under.
+    """
+
+    def __init__(self, cards, debug=False):
+        self.cards = cards
+        self.multicolor_assignments = calculate_multicolor_assignments(cards, debug)
+
+    @classmethod
+    def from_csv(cls, csv_file_path='export.csv', debug=False):
+        """Load a collection from a dreamborn.ink CSV export."""
+        return cls(load_my_card_collection_from_chapters(csv_file_path, debug), debug)
+
+    def get(self, chapter, card_key):
+        """Card info for a set/card key, or None if the card is not in the export."""
+        return self.cards.get(chapter, {}).get(card_key)
+
+    def __bool__(self):
+        return bool(self.cards)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from multiprocessing import Pool
+
+from load_images_by_ravensburger import (SNAPSHOT_MODE, DownloadConfig, card_image_path, catalog_cards, download_card,
+                                         get_catalog, start_snapshot, stop_snapshot)
+
+SCRUB_WORKERS = None  # None: one process per CPU
+REPAIR = True  # Re-download missing and corrupt cards after the scrub
+DELETE_ORPHANS = False  # Orphans are only reported unless this is True
+CHUNKSIZE = 32  # Files per task handed to a worker
+
+
+def expected_card_images(card_catalog, lang, base_dir):
+    """Map the path of every catalog card's art to its Card."""
+    return {card_image_path(base_dir, lang, card_data): card_data
+            for card_data in catalog_cards(card_catalog, lang) if card_data.high_res_image}
+
+
+def stored_card_images(lang, base_dir):
+    """Every file under cards/{lang}/webp/."""
+    webp_dir = os.path.join(base_dir, lang, "webp")
+    if not os.path.exists(webp_dir): return []
+    return [os.path.join(webp_dir, set_id, filename)
+            for set_id in sorted(os.listdir(webp_dir)) if os.path.isdir(os.path.join(webp_dir, set_id))
+            for filename in sorted(os.listdir(os.path.join(webp_dir, set_id)))]
+
+
+def check_image(task):
+    """Fully decode one image and compare its size with the catalog's; returns (path, problem or None)."""
+    from PIL import Image
+
+    path, expected_size = task
+    try:
+        with Image.open(path) as img:
+            img.load()  # Opening only reads the header; truncated data shows up when decoding
+            size = img.size
+    except Exception as e:
+        return path, f"cannot decode: {e}"
+    if expected_size and (size[1] != expected_size[1] or (expected_size[0] and size[0] != expected_size[0])):
+        return path, f"size {size[0]}x{size[1]}, expected {expected_size[0] or '?'}x{expected_size[1]}"
+    return path, None
+
+
+def scrub_language(card_catalog, lang, base_dir="cards", workers=None):
+    """
+    Check the stored art of one language against the catalog, decoding every file on a process pool.
+    Returns a report with the missing paths, corrupt {path: problem}, orphaned paths (files no catalog card
+    is stored as), the expected Cards by path for repair_cards, and the timing.
+    """
+    expected = expected_card_images(card_catalog, lang, base_dir)
+    stored = stored_card_images(lang, base_dir)
+    stored_set = set(stored)
+    tasks = [(path, expected[path].high_res_size) for path in stored if path in expected]
+
+    start = time.perf_counter()
+    corrupt = {}
+    with Pool(workers or os.cpu_count() or 1) as pool:
+        for path, problem in pool.imap_unordered(check_image, tasks, chunksize=CHUNKSIZE):
+            if problem: corrupt[path] = problem
+    seconds = time.perf_counter() - start
+
+    return {
+        "lang": lang,
+        "expected": expected,
+        "checked": len(tasks),
+        "missing": sorted(path for path in expected if path not in stored_set),
+        "corrupt": dict(sorted(corrupt.items())),
+        "orphaned": [path for path in stored if path not in expected],
+        "seconds": seconds,
+        "images_per_second": len(tasks) / seconds if seconds else 0.0,
+    }
+
+
+def repair_cards(report, config, delete_orphans=DELETE_ORPHANS):
+    """Re-download exactly the missing and corrupt cards of a report and check them again; returns the paths still broken."""
+    still_broken = []
+    for path in report["missing"] + list(report["corrupt"]):
+        card_data = report["expected"][path]
+        try:
+            download_card(card_data, report["lang"], config)
+        except Exception as e:
+            print(f"Failed to re-download {card_data.set_id}/{card_data.id}: {e}")
+            still_broken.append(path)
+            continue
+        _, problem = check_image((path, card_data.high_res_size))
+        if problem:
+            print(f"Warning: {path} is still broken after re-downloading: {problem}")
+            still_broken.append(path)
+    if delete_orphans:
+        for path in report["orphaned"]:
+            os.remove(path)
+            print(f"Deleted orphan: {path}")
+    return still_broken
+
+
+def print_report(report):
+    print(f"{report['lang']}: checked {report['checked']} images in {report['seconds']:.2f}s "
+          f"({report['images_per_second']:.0f} images/s): {len(report['missing'])} missing, "
+          f"{len(report['corrupt'])} corrupt, {len(report['orphaned'])} orphaned")
+    for path in report["missing"]:
+        print(f"  missing:  {path}")
+    for path, problem in report["corrupt"].items():
+        print(f"  corrupt:  {path} ({problem})")
+    for path in report["orphaned"]:
+        print(f"  orphaned: {path}")
+
+
+def main():
+    """Scrub the card store of every language and re-download what is broken."""
+    config = DownloadConfig()
+    # Recording would rewrite the snapshot with only the catalog and the re-downloaded cards, so only replay is honoured
+    if SNAPSHOT_MODE == "record":
+        print("Note: SNAPSHOT_MODE 'record' is ignored by the scrub; checking against the live API without touching the snapshot")
+    mock_server = start_snapshot(config, "replay" if SNAPSHOT_MODE == "replay" else None)
+    try:
+        card_catalog = get_catalog(config)
+        for lang in config.languages:
+            report = scrub_language(card_catalog, lang, config.base_dir, SCRUB_WORKERS)
+            print_report(report)
+            if REPAIR and (report["missing"] or report["corrupt"] or (DELETE_ORPHANS and report["orphaned"])):
+                still_broken = repair_cards(report, config)
+                repaired = len(report["missing"]) + len(report["corrupt"]) - len(still_broken)
+                print(f"{lang}: re-downloaded {repaired} cards, {len(still_broken)} still broken")
+    finally:
+        stop_snapshot(config, mock_server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+from collections import defaultdict
+
+BASE_DIR = "cards"
+INDEX_FILENAME = "card_index.json"
+
+# Fields matched word by word (free words in a query search all of them)
+TEXT_FIELDS = ["name", "subtitle", "text"]
+# Fields matched by exact (lower-cased) value
+TERM_FIELDS = ["set", "color", "rarity", "type", "subtype", "inkable", "artist"]
+# Fields supporting range comparisons
+NUMERIC_FIELDS = ["ink_cost", "strength", "willpower", "lore", "move_cost"]
+
+# Convenience spellings accepted in queries
+FIELD_ALIASES = {
+    "cost": "ink_cost", "ink": "ink_cost", "subtypes": "subtype", "card_type": "type",
+    "rules_text": "text", "rules": "text", "colour": "color", "chapter": "set",
+    "quest_value": "lore", "author": "artist", "str": "strength", "will": "willpower",
+}
+
+QUERY_TOKEN = re.compile(r'(-?)([a-z_]+)(<=|>=|!=|:|=|<|>)("[^"]*"|\S*)|(-?)("[^"]*"|\S+)', re.IGNORECASE)
+WORD = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    """Split free text into lower-case search words."""
+    return WORD.findall(str(text or "").lower())
+
+
+def card_document(card, rarity_code):
+    """Flatten a downloader Card into the searchable document stored in the index."""
+    return {
+        "name": card.name,
+        "subtitle": card.subtitle or "",
+        "text": card.rules_text or "",
+        "set": card.set_id,
+        "color": [c.lower() for c in card.magic_ink_colors],
+        "rarity": rarity_code,
+        "type": card.card_type,
+        "subtype": card.subtypes,
+        "inkable": bool(card.inkable),
+        "artist": card.author,
+        "ink_cost": card.ink_cost,
+        "strength": card.strength,
+        "willpower": card.willpower,
+        "lore": card.quest_value,
+        "move_cost": card.move_cost,
+    }
+
+
+def build_card_index(documents):
+    """Build the inverted index from a {"set/id": document} mapping."""
+    postings = defaultdict(lambda: defaultdict(set))
+
+    for doc_id, doc in documents.items():
+        for field in TEXT_FIELDS:
+            for word in tokenize(doc.get(field)):
+                postings[field][word].add(doc_id)
+        for field in TERM_FIELDS:
+            values = doc.get(field)
+            if not isinstance(values, list):
+                values = [values]
+            for value in values:
+                if value is None or value == "": continue
+                postings[field][str(value).lower()].add(doc_id)
+        for field in NUMERIC_FIELDS:
+            value = doc.get(field)
+            if isinstance(value, (int, float)):
+                postings[field][str(value)].add(doc_id)
+
+    return {
+        "cards": documents,
+        "postings": {field: {value: sorted(ids) for value, ids in values.items()} for field, values in postings.items()},
+    }
+
+
+def save_card_index(index, lang, base_dir=BASE_DIR):
+    """Persist the index next to the card images of the given language."""
+    index_dir = os.path.join(base_dir, lang)
+    os.makedirs(index_dir, exist_ok=True)
+    index_path = os.path.join(index_dir, INDEX_FILENAME)
+    with open(index_path, 'w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, ensure_ascii=False, separators=(',', ':'))
+    return index_path
+
+
+def load_card_index(lang, base_dir=BASE_DIR):
+    """Load a persisted index, turning posting lists into sets for fast intersection."""
+    index_path = os.path.join(base_dir, lang, INDEX_FILENAME)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as index_file:
+            index = json.load(index_file)
+    except FileNotFoundError:
+        print(f"Error: Card index not found at {index_path}. Run load_images_by_ravensburger.py first.")
+        return None
+
+    index["postings"] = {field: {value: frozenset(ids) for value, ids in values.items()} for field, values in index["postings"].items()}
+    index["all"] = frozenset(index["cards"])
+    return index
+
+
+def parse_query(query):
+    """
+    Parse a query like 'subtype:Floodborn ink_cost<=3 color:amber -type:action' into clauses.
+    Each clause is (negate, field, operator, values); field is None for free words.
+    Comma separated values ('color:amber,steel') match any of them. Terms without a value ('set:', a lone '-')
+    are skipped rather than matching nothing; numeric set codes are zero padded like the image folders ('set:1' -> '001').
+    """
+    clauses = []
+    for match in QUERY_TOKEN.finditer(query):
+        if match.group(2):
+            negate, field, operator, raw_value = match.group(1, 2, 3, 4)
+            field = FIELD_ALIASES.get(field.lower(), field.lower())
+            if field not in TEXT_FIELDS + TERM_FIELDS + NUMERIC_FIELDS:
+                raise ValueError(f"Unknown search field '{field}'")
+            if operator in ("<", ">", "<=", ">=", "!=") and field not in NUMERIC_FIELDS:
+                raise ValueError(f"Operator '{operator}' needs a numeric field, got '{field}'")
+            if operator == "!=":
+                negate, operator = "-", "="
+            elif operator == ":":
+                operator = "="
+        else:
+            negate, raw_value = match.group(5, 6)
+            field, operator = None, "="
+        values = [v for v in raw_value.strip('"').lower().split(",") if v]
+        if field is None or field in TEXT_FIELDS:
+            values = [v for v in values if tokenize(v)]
+        elif field == "set":
+            values = [v.zfill(3) if v.isdigit() else v for v in values]
+        if not values: continue
+        clauses.append((negate == "-", field, operator, values))
+    return clauses
+
+
+def _match_clause(index, field, operator, values):
+    """Return the card ids matching a single positive clause."""
+    postings = index["postings"]
+    matched = set()
+    for value in values:
+        if field is None:
+            words = tokenize(value)
+            hits = None
+            for word in words:
+                word_hits = set().union(*(postings.get(f, {}).get(word, ()) for f in TEXT_FIELDS))
+                hits = word_hits if hits is None else hits & word_hits
+            matched |= hits or set()
+        elif field in TEXT_FIELDS:
+            hits = None
+            for word in tokenize(value):
+                word_hits = postings.get(field, {}).get(word, frozenset())
+                hits = set(word_hits) if hits is None else hits & word_hits
+            matched |= hits or set()
+        elif field in NUMERIC_FIELDS:
+            try:
+                number = float(value)
+            except ValueError:
+                raise ValueError(f"Expected a number for '{field}', got '{value}'")
+            for stored, ids in postings.get(field, {}).items():
+                stored_number = float(stored)
+                if ((operator == "=" and stored_number == number) or
+                        (operator == "<" and stored_number < number) or
+                        (operator == ">" and stored_number > number) or
+                        (operator == "<=" and stored_number <= number) or
+                        (operator == ">=" and stored_number >= number)):
+                    matched |= ids
+        else:
+            matched |= postings.get(field, {}).get(value, frozenset())
+    return matched
+
+
+def search_cards(index, query):
+    """
+    Run a query against a loaded index.
+    Returns a set of (set_id, card_key) tuples matching the keys used by the image filenames.
+    """
+    result = None
+    excluded = set()
+    for negate, field, operator, values in parse_query(query):
+        hits = _match_clause(index, field, operator, values)
+        if negate:
+            excluded |= hits
+        else:
+            result = hits if result is None else result & hits
+    if result is None:
+        result = set(index["all"])
+    return {tuple(doc_id.split("/", 1)) for doc_id in result - excluded}
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import sys
+import threading
+import zipfile
+
+SNAPSHOT_PATH = os.path.join("snapshots", "catalog_snapshot.zip")
+SNAPSHOT_TOKEN = "snapshot-access-token"
+
+
+def image_entry_name(url):
+    """Archive entry name for an image URL."""
+    return f"images/{hashlib.sha1(url.encode()).hexdigest()[:20]}"
+
+
+class SnapshotWriter:
+    """
+    Records catalogs and images into a single zip archive.
+    Images are stored uncompressed (they are already compressed), catalogs deflated; the zip central
+    directory gives random access to any card without reading the rest of the archive.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.archive = zipfile.ZipFile(path, "w")
+        self.images = {}
+        self.languages = []
+
+    def add_catalog(self, lang, catalog):
+        self.archive.writestr(f"catalog/{lang}.json", json.dumps(catalog, ensure_ascii=False), compress_type=zipfile.ZIP_DEFLATED)
+        self.languages.append(lang)
+
+    def add_image(self, url, content):
+        if url in self.images: return
+        entry_name = image_entry_name(url)
+        self.archive.writestr(entry_name, content, compress_type=zipfile.ZIP_STORED)
+        self.images[url] = entry_name
+
+    def close(self):
+        manifest = {"languages": self.languages, "images": self.images}
+        self.archive.writestr("manifest.json", json.dumps(manifest), compress_type=zipfile.ZIP_DEFLATED)
+        self.archive.close()
+        print(f"Snapshot saved: {self.path} ({len(self.languages)} catalogs, {len(self.images)} images)")
+
+
+class SnapshotReader:
+    """Random access to a recorded snapshot."""
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.archive = zipfile.ZipFile(path, "r")
+        manifest = json.loads(self.archive.read("manifest.json"))
+        self.languages = manifest["languages"]
+        self.images = manifest["images"]
+        self.entry_to_url = {entry_name: url for url, entry_name in self.images.items()}
+
+    def catalog(self, lang):
+        return json.loads(self.archive.read(f"catalog/{lang}.json"))
+
+    def image(self, entry_name):
+        return self.archive.read(entry_name)
+
+
+def _rewrite_image_urls(catalog, images, base_url):
+    """Point every recorded image URL in a catalog at the local server."""
+    for cards in catalog.get("cards", {}).values():
+        for card in cards:
+            for image in card.get("image_urls", []):
+                if image.get("url") in images:
+                    image["url"] = f"{base_url}/{images[image['url']]}"
+            if card.get("foil_mask_url") in images:
+                card["foil_mask_url"] = f"{base_url}/{images[card['foil_mask_url']]}"
+    return catalog
+
+
+def _make_handler(reader, base_url_holder):
+    from http.server import BaseHTTPRequestHandler
+
+    class SnapshotRequestHandler(BaseHTTPRequestHandler):
+        """Mimics the Ravensburger token and catalog endpoints and serves recorded images."""
+
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != "/token":
+                return self._send(404, b'{"error": "not_found"}')
+            if not self.headers.get("Authorization", "").startswith("Basic "):
+                return self._send(401, b'{"error": "invalid_client"}')
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._send(200, json.dumps({"access_token": SNAPSHOT_TOKEN, "token_type": "bearer", "expires_in": 3600}).encode())
+
+        def do_GET(self):
+            if self.path.startswith("/v2/catalog/"):
+                if self.headers.get("Authorization") != f"Bearer {SNAPSHOT_TOKEN}":
+                    return self._send(401, b'{"error": "unauthorized"}')
+                lang = self.path.rsplit("/", 1)[-1]
+                if lang not in reader.languages:
+                    return self._send(404, b'{"error": "unknown_language"}')
+                catalog = _rewrite_image_urls(reader.catalog(lang), reader.images, base_url_holder[0])
+                return self._send(200, json.dumps(catalog, ensure_ascii=False).encode("utf-8"))
+            entry_name = self.path.lstrip("/")
+            if entry_name in reader.entry_to_url:
+                return self._send(200, reader.image(entry_name), "image/webp")
+            self._send(404, b'{"error": "not_found"}')
+
+        def log_message(self, format, *args):
+            pass
+
+    return SnapshotRequestHandler
+
+
+def start_mock_server(path=SNAPSHOT_PATH, port=0):
+    """
+    Serve a snapshot on localhost in a background thread.
+    Returns (server, base_url); point LOGIN_URL at base_url + "/token" and CATALOG_URL at base_url + "/v2/catalog/{lang}".
+    """
+    from http.server import ThreadingHTTPServer
+
+    reader = SnapshotReader(path)
+    base_url_holder = [None]
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(reader, base_url_holder))
+    base_url_holder[0] = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url_holder[0]
+
+
+if __name__ == "__main__":
+    # Usage: python catalog_snapshot.py [snapshot.zip] [port] - serve a snapshot for CI or benchmarks
+    snapshot_path = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    mock_server, base_url = start_mock_server(snapshot_path, int(sys.argv[2]) if len(sys.argv) > 2 else 8080)
+    print(f"Serving {snapshot_path} at {base_url} (token: {base_url}/token, catalog: {base_url}/v2/catalog/<lang>)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mock_server.shutdown()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import csv
+import json
+import os
+import time
+
+# NumPy is imported inside the functions that need it, so importing this module stays cheap
+from card_collection import CardCollection
+from create_collection_per_color import ALL_SETS, BASE_DIR, CARD_TYPES_ORDER
+
+PLAYSET_SIZE = 4
+STATS_DIR = os.path.join(BASE_DIR, "output", "stats")
+SLICE_FIELDS = ["set", "color", "rarity", "cards", "owned", "completion", "complete_playsets", "playset_copies", "playset_progress", "normal", "foil", "foil_ratio", "multicolor"]
+
+
+def collection_to_arrays(collection):
+    """
+    Flatten a CardCollection into parallel NumPy arrays, one row per card per color view it appears in.
+    Colors follow the renderer: non-Enchanted multicolor cards count for their assigned color,
+    Enchanted multicolor cards count for every one of their colors; "primary" is True only on a card's first
+    row, so totals that do not split by color count every card once.
+    """
+    import numpy as np
+
+    multicolor_assignments = collection.multicolor_assignments
+    sets, colors, rarities, normals, foils, multis, primaries = [], [], [], [], [], [], []
+    for chapter, cards in collection.cards.items():
+        for card_key, card_info in cards.items():
+            card_colors = [c.lower() for c in card_info.get("color", [])]
+            rarity = card_info.get("rarity", "")
+            is_multicolor = card_info.get("multicolor", False)
+            if is_multicolor and rarity != "ENCHANTED":
+                assigned_color = multicolor_assignments.get((chapter, card_key))
+                view_colors = [assigned_color] if assigned_color else card_colors[:1]
+            else:
+                view_colors = card_colors or ["none"]
+            try:
+                normal_count, foil_count = int(card_info.get("normal", 0)), int(card_info.get("foil", 0))
+            except ValueError:
+                print(f"Warning: Invalid counts for {chapter}/{card_key}, treating as 0.")
+                normal_count, foil_count = 0, 0
+            for view_index, view_color in enumerate(view_colors):
+                sets.append(chapter)
+                colors.append(view_color)
+                rarities.append(rarity)
+                normals.append(normal_count)
+                foils.append(foil_count)
+                multis.append(is_multicolor)
+                primaries.append(view_index == 0)
+
+    return {
+        "set": np.array(sets, dtype=object),
+        "color": np.array(colors, dtype=object),
+        "rarity": np.array(rarities, dtype=object),
+        "normal": np.array(normals, dtype=np.int64),
+        "foil": np.array(foils, dtype=np.int64),
+        "multicolor": np.array(multis, dtype=bool),
+        "primary": np.array(primaries, dtype=bool),
+    }
+
+
+def _ordered_categories(values, preferred_order):
+    """Unique values in preferred order first, unknown ones sorted after; plus the inverse codes."""
+    import numpy as np
+
+    unique_values, inverse = np.unique(values.astype(str), return_inverse=True)
+    ordered = [v for v in preferred_order if v in unique_values] + sorted(v for v in unique_values if v not in preferred_order)
+    remap = np.array([ordered.index(v) for v in unique_values], dtype=np.int64)
+    return ordered, remap[inverse]
+
+
+def _ratio(numerator, denominator):
+    """Element-wise ratio that yields 0 where the denominator is empty."""
+    import numpy as np
+
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape, dtype=float), where=denominator > 0)
+
+
+def _metrics(cube):
+    """Derive ratios from a dict of summed count arrays (any shape)."""
+    return {
+        **cube,
+        "completion": _ratio(cube["owned"], cube["cards"]),
+        "playset_progress": _ratio(cube["playset_copies"], cube["cards"] * PLAYSET_SIZE),
+        "foil_ratio": _ratio(cube["foil"], cube["normal"] + cube["foil"]),
+    }
+
+
+def compute_collection_stats(arrays):
+    """Compute every set x color x rarity slice plus per-axis totals in one vectorized pass."""
+    import numpy as np
+
+    set_names, set_idx = _ordered_categories(arrays["set"], ALL_SETS)
+    color_names, color_idx = _ordered_categories(arrays["color"], CARD_TYPES_ORDER)
+    rarity_names, rarity_idx = _ordered_categories(arrays["rarity"], [])
+    shape = (len(set_names), len(color_names), len(rarity_names))
+    flat_idx = np.ravel_multi_index((set_idx, color_idx, rarity_idx), shape) if len(set_idx) else set_idx
+    size = int(np.prod(shape))
+
+    total = arrays["normal"] + arrays["foil"]
+    per_card = {
+        "cards": np.ones_like(total),
+        "owned": (total > 0).astype(np.int64),
+        "complete_playsets": (total >= PLAYSET_SIZE).astype(np.int64),
+        "playset_copies": np.minimum(total, PLAYSET_SIZE),
+        "normal": arrays["normal"],
+        "foil": arrays["foil"],
+        "multicolor": arrays["multicolor"].astype(np.int64),
+    }
+    cube = {name: np.bincount(flat_idx, weights=values, minlength=size).astype(np.int64).reshape(shape) for name, values in per_card.items()}
+    # Same cube over the primary rows only: Enchanted multicolor cards have one row per color, which only the color totals may count
+    primary = arrays["primary"]
+    primary_cube = {name: np.bincount(flat_idx[primary], weights=values[primary], minlength=size).astype(np.int64).reshape(shape) for name, values in per_card.items()}
+
+    axes = {"set": (primary_cube, (1, 2)), "color": (cube, (0, 2)), "rarity": (primary_cube, (0, 1))}
+    labels = {"set": set_names, "color": color_names, "rarity": rarity_names}
+    totals = {}
+    for axis_name, (axis_cube, summed_axes) in axes.items():
+        axis_metrics = _metrics({name: values.sum(axis=summed_axes) for name, values in axis_cube.items()})
+        totals[axis_name] = {label: {name: values[i].item() for name, values in axis_metrics.items()} for i, label in enumerate(labels[axis_name])}
+    overall_metrics = _metrics({name: np.array(values.sum()) for name, values in primary_cube.items()})
+    overall = {name: values.item() for name, values in overall_metrics.items()}
+
+    slice_metrics = _metrics(cube)
+    slices = []
+    for s, c, r in zip(*np.nonzero(cube["cards"])):
+        row = {"set": set_names[s], "color": color_names[c], "rarity": rarity_names[r]}
+        row.update({name: values[s, c, r].item() for name, values in slice_metrics.items()})
+        slices.append(row)
+
+    return {"overall": overall, "totals": totals, "slices": slices}
+
+
+def multicolor_assignment_balance(collection):
+    """Count how many cards of each (set, color pair) of a CardCollection were assigned to either color."""
+    balance = {}
+    for (chapter, card_key), assigned_color in collection.multicolor_assignments.items():
+        card_info = collection.get(chapter, card_key) or {}
+        color_pair = "&".join(sorted(c.lower() for c in card_info.get("color", [])))
+        entry = balance.setdefault(chapter, {}).setdefault(color_pair, {})
+        entry[assigned_color] = entry.get(assigned_color, 0) + 1
+    return balance
+
+
+def write_stats(stats, output_dir=STATS_DIR):
+    """Write the stats as JSON (everything) and CSV (one row per slice)."""
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, "collection_stats.json")
+    with open(json_path, 'w', encoding='utf-8') as json_file:
+        json.dump(stats, json_file, indent=2)
+    csv_path = os.path.join(output_dir, "collection_stats.csv")
+    with open(csv_path, 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=SLICE_FIELDS)
+        writer.writeheader()
+        for row in stats["slices"]:
+            writer.writerow({name: round(value, 4) if isinstance(value, float) else value for name, value in row.items()})
+    return json_path, csv_path
+
+
+if __name__ == "__main__":
+    my_collection = CardCollection.from_csv('export.csv')
+    if not my_collection:
+        print("Exiting due to failure loading card collection.")
+        exit()
+
+    start = time.perf_counter()
+    card_arrays = collection_to_arrays(my_collection)
+    collection_stats = compute_collection_stats(card_arrays)
+    collection_stats["multicolor_balance"] = multicolor_assignment_balance(my_collection)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for path in write_stats(collection_stats):
+        print(f"Stats saved: {path}")
+    overall = collection_stats["overall"]
+    print(f"Cards owned: {overall['owned']}/{overall['cards']} ({overall['completion']:.1%}), "
+          f"playset progress: {overall['playset_progress']:.1%}, foil ratio: {overall['foil_ratio']:.1%}")
+    print(f"Computed {len(collection_stats['slices'])} slices in {elapsed_ms:.1f} ms")
@@ -1,25 +1,43 @@
 # -*- coding: utf-8 -*-
-import csv
 import os
-import re  # Import regex module
 from collections import namedtuple, defaultdict
+from functools import lru_cache
 
-from PIL import Image, ImageDraw, ImageFont
+# Pillow (and NumPy via png_writer) are imported inside the functions that draw, so importing this
+# module as a library, or running commands that never touch an image, stays fast.
+from card_collection import CardCollection
+from card_search import load_card_index, search_cards
+from foil_effect import FoilLayer, find_foil_mask, load_foil_mask, save_animated_webp
+from pdf_binder import save_binder_pdf
+from sprite_atlas import ATLAS_SCALE, chapter_atlas, save_view_manifest
 
 # Global Settings
 DEBUG = True
-SAVE_AS = ["png", "webp", "jpg"]
+SAVE_AS = ["png", "webp", "jpg"]  # Add "pdf" for printable 3x3 binder pages, "atlas" for sprite atlas + JSON manifests
+RASTER_FORMATS = ["png", "webp", "jpg"]
+# PNG encoder: "pillow" (single core) or "parallel" (strips filtered and deflated on all cores, see png_writer.py)
+PNG_ENCODER = "pillow"
+PNG_COMPRESSION_LEVEL = 6
+PNG_QUANTIZE = False  # Write a lossless palette PNG when an output has 256 colors or fewer ("parallel" only)
+# Composite onto opaque RGB canvases: no RGBA card tiles or copies, and no convert("RGB") before JPEG; False keeps the old RGBA canvases
+OPAQUE_RENDER = True
+# Holographic sheen on owned foil cards through their foil masks: None, "static" or "animated" (looping WebP; PNG/JPG stay static)
+FOIL_EFFECT = None
+# WebP/JPEG encoding: {"quality": 60} (fixed), {"max_bytes": 8000000} (best quality under a size limit)
+# or {"min_ssim": 0.95} (smallest file above a similarity floor); searched settings are reused on later runs
+ENCODING_PROFILE = {"quality": 60}
 LANGUAGES = ["en"]  # Add "de", "fr", "it" if needed
 CHAPTERS = ["001", "002", "003", "004", "005", "006", "007", "008", "009", "010"]
 # Define which sets are considered 'special' if different logic applies beyond key generation
 SPECIAL_CHAPTERS = ["P1", "P2", "C1", "D23", "1TFC"]
 # Combine all known set codes for easier checking
 ALL_SETS = CHAPTERS + SPECIAL_CHAPTERS  # Added 1TFC based on filename example
+# Themed sheets rendered from the search index: {output name: query}
+CUSTOM_QUERIES = {
+    # "floodborn_cheap_amber": "subtype:Floodborn ink_cost<=3 color:amber",
+}
 ColorType = namedtuple("ColorType", ["name", "color"])
 
-# Global dictionary to store multicolor card assignments
-MULTICOLOR_ASSIGNMENTS = {}
-
 # (CARD_TYPES, CHAPTER_NAMES, CARD_RARITY, CARD_RARITY_ORDER remain the same)
 CARD_TYPES = [
     ColorType("amber", (211, 149, 45)), ColorType("amethyst", (155, 89, 182)),
@@ -44,193 +62,128 @@ CARD_RARITY = [
 ]
 CARD_RARITY_ORDER = ["CC", "UC", "RR", "SR", "LL", "EP", "EE", "IC", "SP"]
 
-# Constants
+# Constants (defaults for the RenderConfig built when run as a script)
 SCALING = 1
 BASE_DIR = "cards"
-PADDING = int(50 * SCALING)
-CARD_WIDTH, CARD_HEIGHT = int(630 * SCALING), int(880 * SCALING)
 IMAGES_PER_ROW = 6
-CORNER_RADIUS = int(20 * SCALING)
 
 
-def csv_to_json(csv_file_path):
-    """Convert CSV data to JSON format."""
-    # (Code remains the same)
-    try:
-        with open(csv_file_path, 'r', encoding='utf-8') as csv_file:
-            header_line = csv_file.readline()
-            headers = [h.strip().replace('\ufeff', '') for h in header_line.split(',')]
-            csv_file.seek(0)
+class RenderConfig:
+    """Settings of a render run. Card, padding and corner sizes follow the scaling."""
+
+    def __init__(self, scaling=SCALING, save_as=None, debug=False, base_dir=BASE_DIR,
+                 png_encoder=PNG_ENCODER, png_compression_level=PNG_COMPRESSION_LEVEL, png_quantize=PNG_QUANTIZE,
+                 encoding_profile=None, opaque=OPAQUE_RENDER, foil_effect=FOIL_EFFECT):
+        self.scaling = scaling
+        self.save_as = list(SAVE_AS if save_as is None else save_as)
+        self.debug = debug
+        self.base_dir = base_dir
+        self.png_encoder = png_encoder
+        self.png_compression_level = png_compression_level
+        self.png_quantize = png_quantize
+        self.encoding_profile = dict(ENCODING_PROFILE if encoding_profile is None else encoding_profile)
+        self.opaque = opaque
+        self.foil_effect = foil_effect
+        self.canvas_mode = "RGB" if opaque else "RGBA"
+        self.padding = int(50 * scaling)
+        self.card_width, self.card_height = int(630 * scaling), int(880 * scaling)
+        self.corner_radius = int(20 * scaling)
+
+    def canvas_color(self, color_rgb):
+        """Background fill for a canvas in canvas_mode."""
+        return tuple(color_rgb) if self.opaque else (*color_rgb, 255)
+
+
+class AssetContext:
+    """Fonts and badge images shared by every view rendered with it; each file is loaded once, on first use."""
+
+    def __init__(self, config, asset_dir="assets"):
+        self.config = config
+        self.asset_dir = asset_dir
+        self.fonts = {}
+        self.images = {}
+
+    def font(self, size):
+        """The badge/title font at size * scaling, falling back to Pillow's default font."""
+        from PIL import ImageFont
+
+        if size not in self.fonts:
             try:
-                dialect = csv.Sniffer().sniff(csv_file.read(2048), delimiters=',;\t|')
-            except csv.Error:
-                print("Warning: Could not automatically determine CSV delimiter. Assuming comma.")
-                dialect = 'excel'
-            csv_file.seek(0)
-            csv_reader = csv.DictReader(csv_file, dialect=dialect)
-            csv_reader.fieldnames = [key.strip().replace('\ufeff', '') for key in csv_reader.fieldnames or headers]
-            return list(csv_reader)
-    except FileNotFoundError:
-        print(f"Error: CSV file not found at {csv_file_path}")
-        return []
-    except Exception as e:
-        print(f"Error reading CSV file {csv_file_path}: {e}")
-        return []
-
-
-# --- REVISED Helper function to generate standardized keys ---
-def generate_card_key(set_code, card_num_raw_from_csv):
-    """
-    Generates a standardized card key matching the expected FILENAME format.
-    Handles main chapter padding/variants and special set number stripping/padding.
-    """
-    card_num_raw = str(card_num_raw_from_csv).strip()  # Ensure string
-
-    # Regex to find numeric part and optional alphabetic suffix
-    # Allows optional prefix (like 'P') before the number
-    match = re.match(r'^[a-zA-Z]*(\d+)([a-zA-Z]*)$', card_num_raw)
-
-    if match:
-        num_part = match.group(1)
-        variant_part = match.group(2).lower()
-        # Pad numeric part to 3 digits (adjust if filename convention differs)
-        padded_num = num_part.zfill(3)
-        # Return in filename format: padded number + variant
-        key = padded_num + variant_part
-        # if DEBUG: print(f"Generated key: {key} from set={set_code}, raw={card_num_raw}")
-        return key
-    else:
-        # Fallback for formats not matching the pattern (e.g., "1TFC EN 1" ?)
-        # Or purely non-numeric IDs if they exist.
-        # We might need specific handling for '1TFC EN 1' style if that's common.
-        # For now, return raw as a last resort, but warn.
-        if DEBUG: print(f"Warning: Could not parse card number '{card_num_raw}' for set {set_code} into standard format. Using raw value '{card_num_raw}' as key.")
-        return card_num_raw
-
-
-# --- End Helper function ---
+                self.fonts[size] = ImageFont.truetype(os.path.join(self.asset_dir, "black.ttf"), int(size * self.config.scaling))
+            except Exception as e:
+                print(f"Warning: Error loading font: {e}. Text will use the default font.")
+                self.fonts[size] = ImageFont.load_default()
+        return self.fonts[size]
 
+    def image(self, filename):
+        """An overlay image from the asset directory, or None if it cannot be loaded."""
+        from PIL import Image
 
-def load_my_card_collection_from_chapters():
-    """Load the card collection, generating standardized keys based on filename convention."""
-    json_objects = csv_to_json('export.csv')
-    if not json_objects:
-        print("Failed to load data from export.csv. Exiting.")
-        exit()
+        if filename not in self.images:
+            try:
+                self.images[filename] = Image.open(os.path.join(self.asset_dir, filename))
+                self.images[filename].load()
+            except Exception as e:
+                print(f"Warning: Error loading asset {filename}: {e}. Some overlays might be missing.")
+                self.images[filename] = None
+        return self.images[filename]
 
-    dict_all_chapters = defaultdict(dict)
-    expected_keys = ["Name", "Normal", "Foil", "Color", "Rarity", "Set", "Card Number"]
 
-    if json_objects and not all(key in json_objects[0] for key in expected_keys):
-        print(f"Error: CSV missing one or more expected columns: {expected_keys}")
-        print(f"Found columns: {list(json_objects[0].keys())}")
-        exit()
+@lru_cache(maxsize=8)
+def corner_mask(size, rad):
+    """'L' mask of the given size with rounded corners; shared between calls, so do not modify it."""
+    from PIL import Image, ImageDraw
 
-    loaded_keys_sample = defaultdict(list)  # For debugging
+    circle = Image.new('L', (rad * 2, rad * 2), 0)
+    draw = ImageDraw.Draw(circle)
+    draw.ellipse((0, 0, rad * 2, rad * 2), fill=255)
+    alpha = Image.new('L', size, 255)
+    w, h = size
+    alpha.paste(circle.crop((0, 0, rad, rad)), (0, 0))
+    alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, h - rad))
+    alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (w - rad, 0))
+    alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (w - rad, h - rad))
+    return alpha
 
-    for entry in json_objects:
-        try:
-            # (Color, Rarity parsing remain the same)
-            color_str = entry.get("Color", "").strip()
-            colors = color_str.split(" ") if color_str else []
-            colors = [c for c in colors if c]
-            rarity = entry.get("Rarity", "").strip().upper()
-
-            card_dict = {
-                "name": entry.get("Name", "Unknown").strip(),
-                "normal": entry.get("Normal", "0").strip() or "0",
-                "foil": entry.get("Foil", "0").strip() or "0",
-                "color": colors,
-                "rarity": rarity,
-                "multicolor": len(colors) > 1,
-            }
-
-            card_num_raw = entry.get("Card Number", "").strip()
-            set_code = entry.get("Set", "").strip()
-
-            # *** Use the revised helper function to generate the key ***
-            card_key = generate_card_key(set_code, card_num_raw)
-
-            if not card_key: continue
-
-            # Store using the standardized key
-            dict_all_chapters[set_code][card_key] = card_dict
-            if DEBUG and len(loaded_keys_sample[set_code]) < 5:  # Log a few keys per set
-                loaded_keys_sample[set_code].append(card_key)
 
-        except Exception as e:
-            if DEBUG: print(f"Error processing row: {entry}\nError details: {e}")
-            continue
+def round_corners(im, rad):
+    """Round the corners of an image."""
+    im.putalpha(corner_mask(im.size, rad))
+    return im
 
-    if DEBUG:
-        print("Sample keys loaded into MY_COLLECTION:")
-        for set_code, keys in loaded_keys_sample.items():
-            print(f"  Set {set_code}: {keys}")
 
-    return dict_all_chapters
+def paste_card(canvas, img, position, config):
+    """Paste a card (see load_card_image) with rounded corners; opaque canvases skip the RGBA tile."""
+    from PIL import Image
 
+    img_resized = img
+    if img.size != (config.card_width, config.card_height):
+        img_resized = img.resize((config.card_width, config.card_height), resample=Image.LANCZOS)
+    if config.opaque:
+        canvas.paste(img_resized, position, corner_mask(img_resized.size, config.corner_radius))
+    else:
+        img_rounded = round_corners(img_resized, config.corner_radius)
+        canvas.paste(img_rounded, position, img_rounded)
 
-def calculate_multicolor_assignments(collection):
-    """Calculates assignments ONLY for NON-ENCHANTED multicolor cards."""
-    global MULTICOLOR_ASSIGNMENTS
-    MULTICOLOR_ASSIGNMENTS = {}
-    cards_by_combo = defaultdict(list)
-    non_ee_multi_count = 0
 
-    for chapter, cards in collection.items():
-        for card_key, card_info in cards.items():
-            is_multi = card_info.get("multicolor", False)
-            rarity = card_info.get("rarity", "")
+def load_card_image(img_path, config):
+    """
+    Decode a card image for compositing, already at card size so a view only keeps small tiles in memory.
+    RGB for opaque canvases (the corner mask replaces any alpha anyway), else RGBA.
+    """
+    from PIL import Image
 
-            # Skip if not multicolor OR if it IS Enchanted
-            # Ensure check matches the value stored (e.g., "ENCHANTED" or "EE")
-            # Using "ENCHANTED" based on previous filter logic, adjust if needed
-            if not is_multi or rarity == "ENCHANTED":
-                continue
+    with Image.open(img_path) as img:
+        return img.convert(config.canvas_mode).resize((config.card_width, config.card_height), resample=Image.LANCZOS)
 
-            non_ee_multi_count += 1
-            colors = card_info.get("color", [])
-            if len(colors) < 2: continue
-
-            color_pair = tuple(sorted([c.lower() for c in colors]))
-            combo_key = (chapter, color_pair)
-            cards_by_combo[combo_key].append(card_key)
-
-    if DEBUG: print(f"Found {non_ee_multi_count} non-Enchanted multicolor cards to assign.")
-
-    # Assign cards (code remains the same)
-    total_assigned = 0
-    for (chapter, color_pair), card_keys in cards_by_combo.items():
-        sorted_card_keys = sorted(card_keys)
-        num_cards = len(sorted_card_keys)
-        split_point = (num_cards + 1) // 2
-        color1, color2 = color_pair
-        for i, card_key in enumerate(sorted_card_keys):
-            assignment_key = (chapter, card_key)
-            if i < split_point:
-                MULTICOLOR_ASSIGNMENTS[assignment_key] = color1
-            else:
-                MULTICOLOR_ASSIGNMENTS[assignment_key] = color2
-            total_assigned += 1
-        # Optional log per combo
-        if DEBUG and num_cards > 0: print(f"Assigning {chapter} {color_pair}: {split_point} to '{color1}', {num_cards - split_point} to '{color2}'")
-    if DEBUG: print(f"Finished assignment. Total assignments stored: {total_assigned}")
 
+def tint_card(img, tint_rgba):
+    """Blend a translucent tint over a card, as alpha compositing would over an opaque card."""
+    from PIL import Image
 
-def round_corners(im, rad):
-    """Round the corners of an image."""
-    # (Code remains the same)
-    circle = Image.new('L', (rad * 2, rad * 2), 0)
-    draw = ImageDraw.Draw(circle)
-    draw.ellipse((0, 0, rad * 2, rad * 2), fill=255)
-    alpha = Image.new('L', im.size, 255)
-    w, h = im.size
-    alpha.paste(circle.crop((0, 0, rad, rad)), (0, 0))
-    alpha.paste(circle.crop((0, rad, rad, rad * 2)), (0, h - rad))
-    alpha.paste(circle.crop((rad, 0, rad * 2, rad)), (w - rad, 0))
-    alpha.paste(circle.crop((rad, rad, rad * 2, rad * 2)), (w - rad, h - rad))
-    im.putalpha(alpha)
-    return im
+    if img.mode == "RGB":
+        return Image.blend(img, Image.new("RGB", img.size, tint_rgba[:3]), tint_rgba[3] / 255)
+    return Image.alpha_composite(img, Image.new("RGBA", img.size, tint_rgba))
 
 
 def get_rarity_from_filename(filename):
@@ -247,15 +200,17 @@ def get_card_color_from_filename(filename):
     return parts[1].lower().split("&") if len(parts) >= 2 else []
 
 
-def merge_images(images, vertically, offset_merge, space_color=(255, 255, 255, 0), align='center'):
-    """Merges multiple images vertically or horizontally."""
-    # (Code remains the same)
-    if not images: return Image.new('RGBA', (1, 1), space_color)
+def merge_images(images, vertically, offset_merge, space_color=(255, 255, 255, 0), align='center', mode='RGBA'):
+    """Merges multiple images vertically or horizontally onto a canvas of the given mode ('RGB' for opaque output)."""
+    from PIL import Image
+
+    if mode == 'RGB': space_color = tuple(space_color[:3])
+    if not images: return Image.new(mode, (1, 1), space_color)
     widths, heights = zip(*(i.size for i in images))
     if vertically:
         max_width = max(widths) if widths else 1
         total_height = sum(heights) + (offset_merge * (len(images) - 1)) if heights else 1
-        new_im = Image.new('RGBA', (max_width, total_height), space_color)
+        new_im = Image.new(mode, (max_width, total_height), space_color)
         y_offset = 0
         for im in images:
             if align == 'left':
@@ -264,13 +219,13 @@ def merge_images(images, vertically, offset_merge, space_color=(255, 255, 255, 0
                 x_position = max_width - im.size[0]
             else:
                 x_position = (max_width - im.size[0]) // 2
-            paste_im = im if im.mode == 'RGBA' else im.convert('RGBA')
-            new_im.paste(paste_im, (x_position, y_offset), paste_im)
+            # Only images with an alpha channel need a mask; anything else is opaque and pasted as is
+            new_im.paste(im, (x_position, y_offset), im if im.mode == 'RGBA' else None)
             y_offset += im.size[1] + offset_merge
     else:
         max_height = max(heights) if heights else 1
         total_width = sum(widths) + (offset_merge * (len(images) - 1)) if widths else 1
-        new_im = Image.new('RGBA', (total_width, max_height), space_color)
+        new_im = Image.new(mode, (total_width, max_height), space_color)
         x_offset = 0
         for im in images:
             if align == 'top':
@@ -279,47 +234,147 @@ def merge_images(images, vertically, offset_merge, space_color=(255, 255, 255, 0
                 y_position = max_height - im.size[1]
             else:
                 y_position = (max_height - im.size[1]) // 2
-            paste_im = im if im.mode == 'RGBA' else im.convert('RGBA')
-            new_im.paste(paste_im, (x_offset, y_position), paste_im)
+            new_im.paste(im, (x_offset, y_position), im if im.mode == 'RGBA' else None)
             x_offset += im.size[0] + offset_merge
     return new_im
 
 
-def process_images(lang, chapter_list, generate_name,
+def badge_box(base_img, scale, x, y, scaling):
+    """Size of a badge asset at the given scale, placed at (x, y) where x/y may depend on that size."""
+    width, height = int(base_img.width * scale * scaling), int(base_img.height * scale * scaling)
+    return (x(width, height), y(width, height), width, height)
+
+
+def binder_card_for_view(metadata, mark_completed, config, assets):
+    """PDF binder entry for a process_images card, mirroring the tint and badges drawn on the raster grid."""
+    normal_count_img_base, foil_count_img_base = assets.image("normal_card_count.png"), assets.image("foil_card_count.png")
+    done_img_base, missing_img_base = assets.image("done.png"), assets.image("missing.png")
+    total_count = metadata["total_count"]
+    card = {"img_path": metadata["img_path"], "tint": None, "badges": []}
+    if total_count == 0:
+        card["tint"] = (155, 110, 110, 160)
+        if missing_img_base:
+            card["badges"].append({"asset": missing_img_base.filename, "box": badge_box(missing_img_base, 0.36, lambda w, h: config.card_width - w - int(5 * config.scaling), lambda w, h: int(5 * config.scaling), config.scaling)})
+        return card
+    if total_count >= 4 and mark_completed:
+        card["tint"] = (110, 155, 110, 160)
+    if normal_count_img_base:
+        card["badges"].append({"asset": normal_count_img_base.filename, "box": badge_box(normal_count_img_base, 0.75, lambda w, h: config.card_width - w - int(w * 0.75) - 5, lambda w, h: 5, config.scaling),
+                               "text": metadata["normal_count"], "font_size": int(50 * config.scaling), "text_raise": int(10 * config.scaling)})
+    if foil_count_img_base:
+        card["badges"].append({"asset": foil_count_img_base.filename, "box": badge_box(foil_count_img_base, 0.75, lambda w, h: config.card_width - w - 5, lambda w, h: int(h * 0.75) + 5, config.scaling),
+                               "text": metadata["foil_count"], "font_size": int(50 * config.scaling), "text_raise": int(10 * config.scaling)})
+    if total_count >= 4 and mark_completed and done_img_base:
+        card["badges"].append({"asset": done_img_base.filename, "box": badge_box(done_img_base, 0.2, lambda w, h: int(15 * config.scaling), lambda w, h: config.card_height - h - int(15 * config.scaling), config.scaling)})
+    return card
+
+
+def save_pdf(output_dir, generate_name, sections, config):
+    """Save binder sections as a multi-page PDF next to the other output formats."""
+    pdf_path = os.path.join(output_dir, "pdf", f"{generate_name}.pdf")
+    try:
+        page_count = save_binder_pdf(pdf_path, sections, (config.card_width, config.card_height), config.corner_radius)
+        print(f"PDF saved: {pdf_path} ({page_count} pages)")
+    except Exception as e:
+        print(f"Failed to save PDF {pdf_path}: {e}")
+
+
+def load_atlas_tile(img_path, tile_size, corner_radius):
+    """Plain (untinted, badge-free) rounded card tile for the sprite atlas."""
+    from PIL import Image
+
+    try:
+        with Image.open(img_path) as img:
+            tile = img.convert("RGBA").resize(tile_size, resample=Image.LANCZOS)
+    except Exception as e:
+        print(f"Error opening image {img_path}: {e}")
+        return None
+    return round_corners(tile, max(1, int(corner_radius * ATLAS_SCALE)))
+
+
+def save_atlas_manifest(lang, output_dir, generate_name, all_images_per_chapter, img_per_row, bg_color, cell_state, config):
+    """
+    Save the JSON manifest of a view: per chapter the atlas to use and, per card, its atlas position plus
+    the collection state returned by cell_state(metadata). The browser composites tints and badges itself.
+    """
+    sections = []
+    for chapter, images_with_metadata in all_images_per_chapter.items():
+        if not images_with_metadata: continue
+        chapter_dir = os.path.join(config.base_dir, lang, "webp", chapter)
+        atlas = chapter_atlas(lang, chapter, chapter_dir, (config.card_width, config.card_height),
+                              lambda img_path, tile_size: load_atlas_tile(img_path, tile_size, config.corner_radius), os.path.join(config.base_dir, "output"))
+        cells = [{"key": metadata["card_number"], "atlas": atlas["cells"].get(metadata["card_number"]), **cell_state(metadata)} for _, metadata in images_with_metadata]
+        sections.append({"chapter": chapter, "title": CHAPTER_NAMES.get(chapter, chapter), "atlas": atlas["image"], "atlas_size": atlas["size"], "tile_size": atlas["tile_size"], "cells": cells})
+    manifest = {
+        "name": generate_name,
+        "lang": lang,
+        "layout": {"images_per_row": img_per_row, "card_size": [config.card_width, config.card_height], "padding": config.padding, "background": list(bg_color)},
+        "sections": sections,
+    }
+    manifest_path = os.path.join(output_dir, "atlas", f"{generate_name}.json")
+    try:
+        save_view_manifest(manifest_path, manifest)
+        print(f"Manifest saved: {manifest_path}")
+    except Exception as e:
+        print(f"Failed to save manifest {manifest_path}: {e}")
+
+
+def save_png(image, png_path, config):
+    """Save a PNG with the configured encoder."""
+    if config.png_encoder == "parallel":
+        from png_writer import save_png_parallel
+        save_png_parallel(image, png_path, compression_level=config.png_compression_level, quantize=config.png_quantize)
+    else:
+        image.save(png_path, "PNG", compress_level=config.png_compression_level)
+
+
+def save_encoded(image, path, fmt, config, record_settings=True):
+    """Save a WebP ("webp") or JPEG ("jpg") output with the configured encoding profile."""
+    from encoding_profile import SETTINGS_FILENAME, EncodingSettings, encode_with_profile
+
+    settings_store = EncodingSettings(os.path.join(config.base_dir, "output", SETTINGS_FILENAME)) if record_settings else None
+    output_key = os.path.relpath(path, config.base_dir).replace(os.sep, "/")
+    data = encode_with_profile(image, fmt, config.encoding_profile, settings_store, output_key)
+    with open(path, 'wb') as output_file:
+        output_file.write(data)
+
+
+def process_images(lang, chapter_list, generate_name, collection, config,
+                   assets=None,
                    target_color=None,
-                   multicolor_assignments=None,
                    img_per_row=6,
                    color_rgb=(255, 255, 255),
                    mark_completed=False,
                    output_subdir="output",
-                   save_as=SAVE_AS):
-    """Processes images, using standardized keys matching filenames for lookup."""
-    # (Function signature and asset loading remain the same)
+                   save_as=None,
+                   card_set=None):
+    """
+    Processes images, using standardized keys matching filenames for lookup.
+    collection is a CardCollection, config a RenderConfig; assets (AssetContext) can be shared between calls.
+    save_as defaults to config.save_as.
+    card_set optionally restricts the view to a set of (chapter, card_key) tuples, e.g. a search_cards() result.
+    """
+    from PIL import Image, ImageDraw
+
     IMAGES_PER_ROW = img_per_row
+    assets = assets or AssetContext(config)
+    save_as = config.save_as if save_as is None else save_as
+    multicolor_assignments = collection.multicolor_assignments
+    needs_raster = any(fmt in save_as for fmt in RASTER_FORMATS)
     all_images_per_chapter = defaultdict(list)
     total_processed_cards = 0
-    font_count, font_chapter = None, None
-    normal_count_img_base, foil_count_img_base, done_img_base, missing_img_base = None, None, None, None
-    try:
-        font_count = ImageFont.truetype("assets/black.ttf", int(50 * SCALING))
-        font_chapter = ImageFont.truetype("assets/black.ttf", int(180 * SCALING))
-        normal_count_img_base = Image.open("assets/normal_card_count.png")
-        foil_count_img_base = Image.open("assets/foil_card_count.png")
-        done_img_base = Image.open("assets/done.png")
-        missing_img_base = Image.open("assets/missing.png")
-    except Exception as e:
-        print(f"Warning: Error loading assets/fonts: {e}. Some overlays/text might be missing.")
-        font_count = ImageFont.load_default()
-        font_chapter = ImageFont.load_default()
+    font_count, font_chapter = assets.font(50), assets.font(180)
+    normal_count_img_base, foil_count_img_base = assets.image("normal_card_count.png"), assets.image("foil_card_count.png")
+    done_img_base, missing_img_base = assets.image("done.png"), assets.image("missing.png")
 
     for chapter in chapter_list:
         chapter_cards = []
-        chapter_dir = os.path.join(BASE_DIR, lang, "webp", chapter)
+        chapter_dir = os.path.join(config.base_dir, lang, "webp", chapter)
 
         if not os.path.exists(chapter_dir): continue
-        # Skip check `if chapter not in MY_COLLECTION:` because defaultdict handles it
+        # Skip check `if chapter not in collection.cards:` because collection.get handles it
 
-        if DEBUG: print(f"Processing: {chapter_dir}" + (f" for target color: {target_color}" if target_color else ""))
+        if config.debug: print(f"Processing: {chapter_dir}" + (f" for target color: {target_color}" if target_color else ""))
 
         for img_filename in os.listdir(chapter_dir):
             if not (img_filename.lower().endswith(".webp") or img_filename.lower().endswith(".png")): continue
@@ -328,13 +383,16 @@ def process_images(lang, chapter_list, generate_name,
             # This now matches the keys generated by the revised generate_card_key
             card_key = img_filename.split("_")[0]
 
+            # Restrict to the requested card set (e.g. a search result) before any lookup
+            if card_set is not None and (chapter, card_key) not in card_set: continue
+
             # *** Lookup using this standardized filename key ***
-            if chapter not in MY_COLLECTION or card_key not in MY_COLLECTION[chapter]:
+            card_info = collection.get(chapter, card_key)
+            if card_info is None:
                 # Add more specific debug message
-                if DEBUG: print(f"Debug: Key '{card_key}' (from filename '{img_filename}') not found in MY_COLLECTION['{chapter}']. Skipping.")
+                if config.debug: print(f"Debug: Key '{card_key}' (from filename '{img_filename}') not found in the collection for set '{chapter}'. Skipping.")
                 continue
 
-            card_info = MY_COLLECTION[chapter][card_key]
             colors = [c.lower() for c in card_info.get("color", [])]
             rarity = card_info.get("rarity", "")
             is_multicolor = card_info.get("multicolor", False)
@@ -353,7 +411,7 @@ def process_images(lang, chapter_list, generate_name,
                         assigned_color = multicolor_assignments.get(assignment_key)
                         if assigned_color == target_color_lower:
                             include_card = True
-                        elif assigned_color is None and DEBUG and rarity != "ENCHANTED":  # Added check to only warn for non-EE
+                        elif assigned_color is None and config.debug and rarity != "ENCHANTED":  # Added check to only warn for non-EE
                             print(f"  Warning: Missing assignment for Non-EE Multi {card_key} ({colors}) in Chapter {chapter}")
                 elif len(colors) == 1:  # Single Color
                     if colors[0] == target_color_lower: include_card = True
@@ -369,18 +427,19 @@ def process_images(lang, chapter_list, generate_name,
             foil_count = int(card_info.get("foil", 0))
             total_count = normal_count + foil_count
             img_path = os.path.join(chapter_dir, img_filename)
-            try:
-                img = Image.open(img_path).convert("RGBA")
-            except Exception as e:
-                print(f"Error opening image {img_path}: {e}")
-                continue
-            overlay = None
-            if total_count == 0:
-                overlay = Image.new('RGBA', img.size, (155, 110, 110, 160))
-            elif total_count >= 4 and mark_completed:
-                overlay = Image.new('RGBA', img.size, (110, 155, 110, 160))
-            if overlay: img = Image.alpha_composite(img, overlay)
-            metadata = {"chapter": chapter, "card_number": card_key, "color": card_info["color"], "color_rgb": color_rgb, "filename": img_filename, "is_missing": total_count == 0, "normal_count": normal_count,
+            if needs_raster:
+                try:
+                    img = load_card_image(img_path, config)
+                except Exception as e:
+                    print(f"Error opening image {img_path}: {e}")
+                    continue
+            else:
+                img = None  # PDF only: decoded page by page when the binder is written
+            if img and total_count == 0:
+                img = tint_card(img, (155, 110, 110, 160))
+            elif img and total_count >= 4 and mark_completed:
+                img = tint_card(img, (110, 155, 110, 160))
+            metadata = {"chapter": chapter, "card_number": card_key, "color": card_info["color"], "color_rgb": color_rgb, "filename": img_filename, "img_path": img_path, "is_missing": total_count == 0, "normal_count": normal_count,
                         "foil_count": foil_count, "total_count": total_count, "rarity": rarity}
             chapter_cards.append((img, metadata))
             # --- End Image loading & Metadata ---
@@ -388,68 +447,108 @@ def process_images(lang, chapter_list, generate_name,
         # Sort using the standardized card_number key
         chapter_cards.sort(key=lambda x: x[1]["card_number"])
         all_images_per_chapter[chapter] = chapter_cards
-        if DEBUG and chapter_cards: print(f"Chapter {chapter}: Found {len(chapter_cards)} cards matching filter.")
+        if config.debug and chapter_cards: print(f"Chapter {chapter}: Found {len(chapter_cards)} cards matching filter.")
 
-    # --- Image Merging Section (Remains the same) ---
     if total_processed_cards == 0: print(f"No cards found matching the criteria for {generate_name}. Skipping image generation."); return
+    output_base_dir = os.path.join(config.base_dir, output_subdir)
+    if card_set is not None:
+        sub_folder = "custom"
+    else:
+        sub_folder = "all_by_color" if target_color else "all_sets"
+    output_dir = os.path.join(output_base_dir, sub_folder, lang)
+
+    # --- PDF Binder / Atlas Output (independent of the raster composite) ---
+    if "pdf" in save_as:
+        sections = []
+        for chapter, images_with_metadata in all_images_per_chapter.items():
+            if not images_with_metadata: continue
+            cards = [binder_card_for_view(metadata, mark_completed, config, assets) for _, metadata in images_with_metadata]
+            sections.append((f"{CHAPTER_NAMES.get(chapter, chapter)} - {generate_name}", cards))
+        save_pdf(output_dir, generate_name, sections, config)
+    if "atlas" in save_as:
+        def view_cell_state(metadata):
+            total_count = metadata["total_count"]
+            state = "missing" if total_count == 0 else "complete" if total_count >= 4 and mark_completed else "owned"
+            return {"normal": metadata["normal_count"], "foil": metadata["foil_count"], "state": state}
+        save_atlas_manifest(lang, output_dir, generate_name, all_images_per_chapter, IMAGES_PER_ROW, color_rgb, view_cell_state, config)
+    if not needs_raster:
+        total_missing_in_view = sum(metadata["is_missing"] for images_with_metadata in all_images_per_chapter.values() for _, metadata in images_with_metadata)
+        if total_missing_in_view > 0:
+            print(f"Total missing cards shown in {generate_name}: {total_missing_in_view}")
+        return
+
+    # --- Image Merging Section (Remains the same) ---
     images_to_merge = []
     total_missing_in_view = 0
+    foil_layer = FoilLayer(config.scaling) if config.foil_effect else None
+    card_size = (config.card_width, config.card_height)
     for chapter, images_with_metadata in all_images_per_chapter.items():
         if not images_with_metadata: continue
+        grid_foil = FoilLayer(config.scaling)
         num_images = len(images_with_metadata)
         rows = (num_images + IMAGES_PER_ROW - 1) // IMAGES_PER_ROW
-        grid_width = (CARD_WIDTH + PADDING) * min(IMAGES_PER_ROW, num_images) - PADDING + (2 * PADDING)
-        grid_height = (CARD_HEIGHT + PADDING) * rows - PADDING + (2 * PADDING)
-        chapter_image_grid = Image.new('RGBA', (grid_width, grid_height), (*color_rgb, 255))
-        x_offset, y_offset = PADDING, PADDING
+        grid_width = (config.card_width + config.padding) * min(IMAGES_PER_ROW, num_images) - config.padding + (2 * config.padding)
+        grid_height = (config.card_height + config.padding) * rows - config.padding + (2 * config.padding)
+        chapter_image_grid = Image.new(config.canvas_mode, (grid_width, grid_height), config.canvas_color(color_rgb))
+        x_offset, y_offset = config.padding, config.padding
         for index, (img, metadata) in enumerate(images_with_metadata):
-            img_resized = img.resize((CARD_WIDTH, CARD_HEIGHT), resample=Image.LANCZOS)
-            img_rounded = round_corners(img_resized, CORNER_RADIUS)
-            chapter_image_grid.paste(img_rounded, (x_offset, y_offset), img_rounded)
+            paste_card(chapter_image_grid, img, (x_offset, y_offset), config)
             normal_count = metadata["normal_count"]
             foil_count = metadata["foil_count"]
             total_count = metadata["total_count"]
+            foil_mask = None
+            if foil_layer is not None and foil_count > 0:
+                foil_mask = load_foil_mask(find_foil_mask(config.base_dir, lang, chapter, metadata["card_number"]), card_size, corner_mask(card_size, config.corner_radius))
             if total_count > 0:
                 if normal_count_img_base and font_count: n_img = normal_count_img_base.copy()
-                n_img = n_img.resize((int(n_img.width * 0.75 * SCALING), int(n_img.height * 0.75 * SCALING)), resample=Image.LANCZOS)
+                n_img = n_img.resize((int(n_img.width * 0.75 * config.scaling), int(n_img.height * 0.75 * config.scaling)), resample=Image.LANCZOS)
                 draw_n = ImageDraw.Draw(n_img)
                 text_n = str(normal_count)
                 bbox_n = draw_n.textbbox((0, 0), text_n, font=font_count)
                 tx_n = (n_img.width - (bbox_n[2] - bbox_n[0])) // 2
-                ty_n = (n_img.height - (bbox_n[3] - bbox_n[1])) // 2 - int(10 * SCALING)
+                ty_n = (n_img.height - (bbox_n[3] - bbox_n[1])) // 2 - int(10 * config.scaling)
                 draw_n.text((tx_n, ty_n), text_n, font=font_count, fill=(255, 255, 255))
-                chapter_image_grid.paste(n_img, (x_offset + CARD_WIDTH - n_img.width - int(n_img.width * 0.75) - 5, y_offset + 5), n_img)
+                chapter_image_grid.paste(n_img, (x_offset + config.card_width - n_img.width - int(n_img.width * 0.75) - 5, y_offset + 5), n_img)
+                # Badges are cut out of the foil mask so the sheen stays on the card art
+                if foil_mask is not None: foil_mask.paste(0, (config.card_width - n_img.width - int(n_img.width * 0.75) - 5, 5), n_img)
                 if foil_count_img_base and font_count:
                     f_img = foil_count_img_base.copy()
-                    f_img = f_img.resize((int(f_img.width * 0.75 * SCALING), int(f_img.height * 0.75 * SCALING)), resample=Image.LANCZOS)
+                    f_img = f_img.resize((int(f_img.width * 0.75 * config.scaling), int(f_img.height * 0.75 * config.scaling)), resample=Image.LANCZOS)
                     draw_f = ImageDraw.Draw(f_img)
                     text_f = str(foil_count)
                     bbox_f = draw_f.textbbox((0, 0), text_f, font=font_count)
                     tx_f = (f_img.width - (bbox_f[2] - bbox_f[0])) // 2
-                    ty_f = (f_img.height - (bbox_f[3] - bbox_f[1])) // 2 - int(10 * SCALING)
+                    ty_f = (f_img.height - (bbox_f[3] - bbox_f[1])) // 2 - int(10 * config.scaling)
                     draw_f.text((tx_f, ty_f), text_f, font=font_count, fill=(255, 255, 255))
-                    chapter_image_grid.paste(f_img, (x_offset + CARD_WIDTH - f_img.width - 5, y_offset + int(f_img.height * 0.75) + 5), f_img)
+                    chapter_image_grid.paste(f_img, (x_offset + config.card_width - f_img.width - 5, y_offset + int(f_img.height * 0.75) + 5), f_img)
+                    if foil_mask is not None: foil_mask.paste(0, (config.card_width - f_img.width - 5, int(f_img.height * 0.75) + 5), f_img)
                 if total_count >= 4 and mark_completed and done_img_base:
                     d_img = done_img_base.copy()
-                    d_img = d_img.resize((int(d_img.width * 0.2 * SCALING), int(d_img.height * 0.2 * SCALING)), resample=Image.LANCZOS)
-                    chapter_image_grid.paste(d_img, (x_offset + int(15 * SCALING), y_offset + CARD_HEIGHT - d_img.height - int(15 * SCALING)), d_img)
+                    d_img = d_img.resize((int(d_img.width * 0.2 * config.scaling), int(d_img.height * 0.2 * config.scaling)), resample=Image.LANCZOS)
+                    chapter_image_grid.paste(d_img, (x_offset + int(15 * config.scaling), y_offset + config.card_height - d_img.height - int(15 * config.scaling)), d_img)
+                    if foil_mask is not None: foil_mask.paste(0, (int(15 * config.scaling), config.card_height - d_img.height - int(15 * config.scaling)), d_img)
+                if foil_mask is not None: grid_foil.add(x_offset, y_offset, foil_mask)
             else:
                 total_missing_in_view += 1
             if missing_img_base and total_count == 0:
                 m_img = missing_img_base.copy()
-                m_img = m_img.resize((int(m_img.width * 0.36 * SCALING), int(m_img.height * 0.36 * SCALING)), resample=Image.LANCZOS)
-                chapter_image_grid.paste(m_img, (x_offset + CARD_WIDTH - m_img.width - int(5 * SCALING), y_offset + int(5 * SCALING)), m_img)
-            x_offset += CARD_WIDTH + PADDING
+                m_img = m_img.resize((int(m_img.width * 0.36 * config.scaling), int(m_img.height * 0.36 * config.scaling)), resample=Image.LANCZOS)
+                chapter_image_grid.paste(m_img, (x_offset + config.card_width - m_img.width - int(5 * config.scaling), y_offset + int(5 * config.scaling)), m_img)
+            x_offset += config.card_width + config.padding
             if (index + 1) % IMAGES_PER_ROW == 0:
-                x_offset = PADDING
-                y_offset += CARD_HEIGHT + PADDING
+                x_offset = config.padding
+                y_offset += config.card_height + config.padding
         if len(chapter_list) == 1 and font_chapter:
-            chapter_name_image = Image.new('RGBA', (grid_width, int(210 * SCALING)), (*color_rgb, 255))
+            chapter_name_image = Image.new(config.canvas_mode, (grid_width, int(210 * config.scaling)), config.canvas_color(color_rgb))
             draw_title = ImageDraw.Draw(chapter_name_image)
             title_text = f"{CHAPTER_NAMES.get(chapter, chapter)}:"
             title_color = (255, 255, 255)
-            draw_title.text((PADDING, 5), title_text, font=font_chapter, fill=title_color)
+            draw_title.text((config.padding, 5), title_text, font=font_chapter, fill=title_color)
             images_to_merge.append(chapter_name_image)
+        if foil_layer is not None:
+            # merge_images stacks the parts top to bottom, padding apart
+            grid_foil.offset(sum(part.height + config.padding for part in images_to_merge))
+            foil_layer.extend(grid_foil)
         images_to_merge.append(chapter_image_grid)
 
     # --- Final Image Saving (Remains the same) ---
@@ -457,21 +556,23 @@ def process_images(lang, chapter_list, generate_name,
         print(f"No images generated for any chapter for {generate_name}.")
         return
     if len(images_to_merge) > 1:
-        final_image = merge_images(images_to_merge, True, PADDING, (*color_rgb, 255), align="left")
+        final_image = merge_images(images_to_merge, True, config.padding, (*color_rgb, 255), align="left", mode=config.canvas_mode)
     elif images_to_merge:
         final_image = images_to_merge[0]
     else:
         print(f"Error: No images available to save for {generate_name}")
         return
-    output_base_dir = os.path.join(BASE_DIR, output_subdir)
-    sub_folder = "all_by_color" if target_color else "all_sets"
-    output_dir = os.path.join(output_base_dir, sub_folder, lang)
+    foil_frames = None
+    if foil_layer:
+        if config.foil_effect == "animated" and "webp" in save_as:
+            foil_frames = foil_layer.frames(final_image)
+        foil_layer.apply(final_image)
 
     if "png" in save_as:
         png_path = os.path.join(output_dir, "png", f"{generate_name}.png")
         try:
             os.makedirs(os.path.join(output_dir, "png"), exist_ok=True)
-            final_image.save(png_path, "PNG")
+            save_png(final_image, png_path, config)
             print(f"Image saved: {png_path}")
         except Exception as e:
             print(f"Failed to save PNG image {png_path}: {e}")
@@ -479,7 +580,12 @@ def process_images(lang, chapter_list, generate_name,
         webp_path = os.path.join(output_dir, "webp", f"{generate_name}.webp")
         try:
             os.makedirs(os.path.join(output_dir, "webp"), exist_ok=True)
-            final_image.save(webp_path, "WebP", quality=60)
+            if foil_frames:
+                from encoding_profile import DEFAULT_QUALITY
+                # Size/SSIM searches are for single images; animations use the profile's quality or the default
+                save_animated_webp(foil_frames, webp_path, config.encoding_profile.get("quality", DEFAULT_QUALITY))
+            else:
+                save_encoded(final_image, webp_path, "webp", config)
             print(f"Image saved: {webp_path}")
         except Exception as e:
             print(f"Failed to save WebP image {webp_path}: {e}")
@@ -487,7 +593,7 @@ def process_images(lang, chapter_list, generate_name,
         jpg_path = os.path.join(output_dir, "jpg", f"{generate_name}.jpg")
         try:
             os.makedirs(os.path.join(output_dir, "jpg"), exist_ok=True)
-            final_image.convert("RGB").save(jpg_path, "JPEG", quality=60)
+            save_encoded(final_image, jpg_path, "jpg", config)
             print(f"Image saved: {jpg_path}")
         except Exception as e:
             print(f"Failed to save JPG image {jpg_path}: {e}")
@@ -496,48 +602,57 @@ def process_images(lang, chapter_list, generate_name,
         print(f"Total missing cards shown in {generate_name}: {total_missing_in_view}")
 
 
-def merge_cards(lang, color_rgb, img_per_row, generate_name, mark_completed, chapter_list, save_as):
+def merge_cards(lang, color_rgb, img_per_row, generate_name, mark_completed, chapter_list, save_as, collection, config, assets=None):
     """Merge all cards."""
-    # (Call remains the same)
     print(f"--- Merging all cards for chapters: {chapter_list} ---")
-    process_images(lang=lang, chapter_list=chapter_list, generate_name=generate_name, target_color=None, multicolor_assignments=MULTICOLOR_ASSIGNMENTS, img_per_row=img_per_row, color_rgb=color_rgb,
+    process_images(lang=lang, chapter_list=chapter_list, generate_name=generate_name, collection=collection, config=config, assets=assets, target_color=None, img_per_row=img_per_row, color_rgb=color_rgb,
                    mark_completed=mark_completed, output_subdir="output", save_as=save_as)
 
 
-def merge_cards_for_color(lang, merge_color, color_rgb, img_per_row, generate_name, mark_completed, chapter_list, save_as):
+def merge_cards_for_color(lang, merge_color, color_rgb, img_per_row, generate_name, mark_completed, chapter_list, save_as, collection, config, assets=None):
     """Merge cards of a specific color for specific chapter(s)."""
-    # (Call remains the same)
     print(f"--- Merging cards for color: {merge_color} in chapters: {chapter_list} ---")
-    process_images(lang=lang, chapter_list=chapter_list, generate_name=generate_name, target_color=merge_color, multicolor_assignments=MULTICOLOR_ASSIGNMENTS, img_per_row=img_per_row, color_rgb=color_rgb,
+    process_images(lang=lang, chapter_list=chapter_list, generate_name=generate_name, collection=collection, config=config, assets=assets, target_color=merge_color, img_per_row=img_per_row, color_rgb=color_rgb,
                    mark_completed=mark_completed, output_subdir="output", save_as=save_as)
 
 
-def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_list, rarity_filter=None, save_as=SAVE_AS):
+def merge_cards_for_query(lang, query, color_rgb, img_per_row, generate_name, mark_completed, chapter_list, save_as, collection, config, assets=None):
+    """Merge the cards matching a search query (e.g. 'subtype:Floodborn ink_cost<=3 color:amber')."""
+    print(f"--- Merging cards for query: '{query}' in chapters: {chapter_list} ---")
+    card_index = load_card_index(lang, config.base_dir)
+    if card_index is None: return
+    try:
+        card_set = search_cards(card_index, query)
+    except ValueError as e:
+        print(f"Invalid search query '{query}': {e}")
+        return
+    if config.debug: print(f"Query '{query}' matched {len(card_set)} cards in the catalog.")
+    process_images(lang=lang, chapter_list=chapter_list, generate_name=generate_name, collection=collection, config=config, assets=assets, target_color=None, img_per_row=img_per_row, color_rgb=color_rgb,
+                   mark_completed=mark_completed, output_subdir="output", save_as=save_as, card_set=card_set)
+
+
+def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_list, collection, config, assets=None, rarity_filter=None, save_as=None):
     """Merge cards missing for playset completion, using standardized keys matching filenames."""
-    # (Function signature and initial setup remain the same)
+    from PIL import Image, ImageDraw
+
     print(f"--- Merging missing playset cards: {chapter_list} " f"{'Rarity: ' + rarity_filter if rarity_filter else ''} ---")
     IMAGES_PER_ROW = img_per_row
+    assets = assets or AssetContext(config)
+    save_as = config.save_as if save_as is None else save_as
+    needs_raster = any(fmt in save_as for fmt in RASTER_FORMATS)
     bg_color = (255, 255, 255)
     text_color = (0, 0, 0)
     all_images_per_chapter = defaultdict(list)
     total_cards_needed = 0
-    font_missing_count, font_chapter_missing = None, None
-    count_img_base = None
-    try:
-        font_missing_count = ImageFont.truetype("assets/black.ttf", int(100 * SCALING))
-        font_chapter_missing = ImageFont.truetype("assets/black.ttf", int(180 * SCALING))
-        count_img_base = Image.open("assets/foil_card_count.png")
-    except Exception as e:
-        print(f"Warning: Error loading assets/fonts for missing playset: {e}. Overlays/text may be missing.")
-        font_missing_count = ImageFont.load_default()
-        font_chapter_missing = ImageFont.load_default()
+    font_missing_count, font_chapter_missing = assets.font(100), assets.font(180)
+    count_img_base = assets.image("foil_card_count.png")
 
     for chapter in chapter_list:
         chapter_cards = []
-        chapter_dir = os.path.join(BASE_DIR, lang, "webp", chapter)
+        chapter_dir = os.path.join(config.base_dir, lang, "webp", chapter)
 
         if not os.path.exists(chapter_dir): continue
-        # Skip check `if chapter not in MY_COLLECTION:`
+        # Skip check `if chapter not in collection.cards:`
 
         for img_filename in os.listdir(chapter_dir):
             if not (img_filename.lower().endswith(".webp") or img_filename.lower().endswith(".png")): continue
@@ -552,13 +667,13 @@ def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_li
             card_key = img_filename.split("_")[0]
 
             # *** Lookup using this standardized filename key ***
-            if chapter not in MY_COLLECTION or card_key not in MY_COLLECTION[chapter]:
+            card_info = collection.get(chapter, card_key)
+            if card_info is None:
                 # This debug message should now only appear if the card genuinely isn't in the CSV
                 # or if the filename format is truly unexpected (e.g., '1TFC EN 1')
-                if DEBUG: print(f"Debug: Key '{card_key}' (from filename '{img_filename}') not found in MY_COLLECTION['{chapter}'] for missing check. Skipping.")
+                if config.debug: print(f"Debug: Key '{card_key}' (from filename '{img_filename}') not found in the collection for set '{chapter}' for missing check. Skipping.")
                 continue
 
-            card_info = MY_COLLECTION[chapter][card_key]
 
             # Check playset count
             normal_count = int(card_info.get("normal", 0))
@@ -571,12 +686,15 @@ def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_li
             missing_count = 4 - total_count
             total_cards_needed += missing_count
             img_path = os.path.join(chapter_dir, img_filename)
-            try:
-                img = Image.open(img_path).convert("RGBA")
-            except Exception as e:
-                print(f"Error opening image {img_path}: {e}")
-                continue
-            metadata = {"chapter": chapter, "card_number": card_key, "filename": img_filename, "missing_count": missing_count, "rarity": card_info.get("rarity", "")}
+            if needs_raster:
+                try:
+                    img = load_card_image(img_path, config)
+                except Exception as e:
+                    print(f"Error opening image {img_path}: {e}")
+                    continue
+            else:
+                img = None  # PDF only: decoded page by page when the binder is written
+            metadata = {"chapter": chapter, "card_number": card_key, "filename": img_filename, "img_path": img_path, "missing_count": missing_count, "rarity": card_info.get("rarity", "")}
             chapter_cards.append((img, metadata))
             # --- End Image Loading & Metadata ---
 
@@ -584,41 +702,61 @@ def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_li
         chapter_cards.sort(key=lambda x: x[1]["card_number"])
         all_images_per_chapter[chapter] = chapter_cards
 
-    # --- Image Merging Section (Remains the same) ---
     if total_cards_needed == 0: print(f"No cards missing for playset found matching criteria for {generate_name}. Skipping."); return
+    output_dir = os.path.join(config.base_dir, "output", "missing_playset", lang)
+
+    # --- PDF Binder / Atlas Output (independent of the raster composite) ---
+    if "pdf" in save_as:
+        sections = []
+        for chapter, images_with_metadata in all_images_per_chapter.items():
+            if not images_with_metadata: continue
+            cards = []
+            for _, metadata in images_with_metadata:
+                card = {"img_path": metadata["img_path"], "badges": []}
+                if count_img_base:
+                    card["badges"].append({"asset": count_img_base.filename, "box": badge_box(count_img_base, 1.5, lambda w, h: config.card_width - w - 5, lambda w, h: 5, config.scaling),
+                                           "text": metadata["missing_count"], "font_size": int(100 * config.scaling), "text_raise": int(10 * config.scaling)})
+                cards.append(card)
+            sections.append((f"{CHAPTER_NAMES.get(chapter, chapter)} - {generate_name}", cards))
+        save_pdf(output_dir, generate_name, sections, config)
+    if "atlas" in save_as:
+        save_atlas_manifest(lang, output_dir, generate_name, all_images_per_chapter, IMAGES_PER_ROW, bg_color, lambda metadata: {"missing_count": metadata["missing_count"]}, config)
+    if not needs_raster:
+        print(f"Total individual cards needed for playset completion (shown): {total_cards_needed}")
+        return
+
+    # --- Image Merging Section (Remains the same) ---
     images_to_merge = []
     for chapter, images_with_metadata in all_images_per_chapter.items():
         if not images_with_metadata: continue
         num_images = len(images_with_metadata)
         rows = (num_images + IMAGES_PER_ROW - 1) // IMAGES_PER_ROW
-        grid_width = (CARD_WIDTH + PADDING) * min(IMAGES_PER_ROW, num_images) - PADDING + (2 * PADDING)
-        grid_height = (CARD_HEIGHT + PADDING) * rows - PADDING + (2 * PADDING)
-        chapter_image_grid = Image.new('RGBA', (grid_width, grid_height), (*bg_color, 255))
-        x_offset, y_offset = PADDING, PADDING
+        grid_width = (config.card_width + config.padding) * min(IMAGES_PER_ROW, num_images) - config.padding + (2 * config.padding)
+        grid_height = (config.card_height + config.padding) * rows - config.padding + (2 * config.padding)
+        chapter_image_grid = Image.new(config.canvas_mode, (grid_width, grid_height), config.canvas_color(bg_color))
+        x_offset, y_offset = config.padding, config.padding
         for index, (img, metadata) in enumerate(images_with_metadata):
-            img_resized = img.resize((CARD_WIDTH, CARD_HEIGHT), resample=Image.LANCZOS)
-            img_rounded = round_corners(img_resized, CORNER_RADIUS)
-            chapter_image_grid.paste(img_rounded, (x_offset, y_offset), img_rounded)
+            paste_card(chapter_image_grid, img, (x_offset, y_offset), config)
             missing_count = metadata["missing_count"]
             if count_img_base and font_missing_count:
                 c_img = count_img_base.copy()
-                c_img = c_img.resize((int(c_img.width * 1.5 * SCALING), int(c_img.height * 1.5 * SCALING)), resample=Image.LANCZOS)
+                c_img = c_img.resize((int(c_img.width * 1.5 * config.scaling), int(c_img.height * 1.5 * config.scaling)), resample=Image.LANCZOS)
                 draw_c = ImageDraw.Draw(c_img)
                 text_c = str(missing_count)
                 bbox_c = draw_c.textbbox((0, 0), text_c, font=font_missing_count)
                 tx_c = (c_img.width - (bbox_c[2] - bbox_c[0])) // 2
-                ty_c = (c_img.height - (bbox_c[3] - bbox_c[1])) // 2 - int(10 * SCALING)
+                ty_c = (c_img.height - (bbox_c[3] - bbox_c[1])) // 2 - int(10 * config.scaling)
                 draw_c.text((tx_c, ty_c), text_c, font=font_missing_count, fill=(255, 255, 255))
-                chapter_image_grid.paste(c_img, (x_offset + CARD_WIDTH - c_img.width - 5, y_offset + 5), c_img)
-            x_offset += CARD_WIDTH + PADDING
+                chapter_image_grid.paste(c_img, (x_offset + config.card_width - c_img.width - 5, y_offset + 5), c_img)
+            x_offset += config.card_width + config.padding
             if (index + 1) % IMAGES_PER_ROW == 0:
-                x_offset = PADDING
-                y_offset += CARD_HEIGHT + PADDING
+                x_offset = config.padding
+                y_offset += config.card_height + config.padding
         if font_chapter_missing:
-            chapter_name_image = Image.new('RGBA', (grid_width, int(210 * SCALING)), (*bg_color, 255))
+            chapter_name_image = Image.new(config.canvas_mode, (grid_width, int(210 * config.scaling)), config.canvas_color(bg_color))
             draw_title = ImageDraw.Draw(chapter_name_image)
             title_text = f"{CHAPTER_NAMES.get(chapter, chapter)}:"
-            draw_title.text((PADDING, 5), title_text, font=font_chapter_missing, fill=text_color)
+            draw_title.text((config.padding, 5), title_text, font=font_chapter_missing, fill=text_color)
             images_to_merge.append(chapter_name_image)
         images_to_merge.append(chapter_image_grid)
 
@@ -626,15 +764,14 @@ def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_li
     if not images_to_merge:
         print(f"No images generated for {generate_name}")
         return
-    final_image = merge_images(images_to_merge, True, PADDING, (*bg_color, 255), align="left")
+    final_image = merge_images(images_to_merge, True, config.padding, (*bg_color, 255), align="left", mode=config.canvas_mode)
     print(f"Total individual cards needed for playset completion (shown): {total_cards_needed}")
-    output_dir = os.path.join(BASE_DIR, "output", "missing_playset", lang)
 
     if "png" in save_as:
         png_path = os.path.join(output_dir, "png", f"{generate_name}.png")
         try:
             os.makedirs(os.path.join(output_dir, "png"), exist_ok=True)
-            final_image.save(png_path, "PNG")
+            save_png(final_image, png_path, config)
             print(f"Image saved: {png_path}")
         except Exception as e:
             print(f"Failed to save PNG image {png_path}: {e}")
@@ -642,7 +779,7 @@ def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_li
         webp_path = os.path.join(output_dir, "webp", f"{generate_name}.webp")
         try:
             os.makedirs(os.path.join(output_dir, "webp"), exist_ok=True)
-            final_image.save(webp_path, "WebP", quality=60)
+            save_encoded(final_image, webp_path, "webp", config)
             print(f"Image saved: {webp_path}")
         except Exception as e:
             print(f"Failed to save WebP image {webp_path}: {e}")
@@ -650,7 +787,7 @@ def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_li
         jpg_path = os.path.join(output_dir, "jpg", f"{generate_name}.jpg")
         try:
             os.makedirs(os.path.join(output_dir, "jpg"), exist_ok=True)
-            final_image.convert("RGB").save(jpg_path, "JPEG", quality=60)
+            save_encoded(final_image, jpg_path, "jpg", config)
             print(f"Image saved: {jpg_path}")
         except Exception as e:
             print(f"Failed to save JPG image {jpg_path}: {e}")
@@ -658,14 +795,15 @@ def merge_cards_missing_for_playset(lang, img_per_row, generate_name, chapter_li
 
 # --- Main Execution (Remains the same structure) ---
 if __name__ == "__main__":
-    MY_COLLECTION = load_my_card_collection_from_chapters()
-    if not MY_COLLECTION:
+    config = RenderConfig(scaling=SCALING, save_as=SAVE_AS, debug=DEBUG, base_dir=BASE_DIR,
+                          png_encoder=PNG_ENCODER, png_compression_level=PNG_COMPRESSION_LEVEL, png_quantize=PNG_QUANTIZE,
+                          encoding_profile=ENCODING_PROFILE, opaque=OPAQUE_RENDER, foil_effect=FOIL_EFFECT)
+    collection = CardCollection.from_csv('export.csv', debug=DEBUG)
+    if not collection:
         print("Exiting due to failure loading card collection.")
         exit()
-    print("Card collection loaded.")
-
-    calculate_multicolor_assignments(MY_COLLECTION)
-    print("Multicolor assignments calculated.")
+    print("Card collection loaded, multicolor assignments calculated.")
+    assets = AssetContext(config)
 
     for lang in LANGUAGES:
         print(f"\n--- Processing Language: {lang.upper()} ---")
@@ -674,7 +812,7 @@ if __name__ == "__main__":
         print("\nGenerating images by color (per chapter)...")
         process_chapters = CHAPTERS  # Process all defined chapters/sets
         for chapter in process_chapters:
-            # No need to check if chapter in MY_COLLECTION here, processing functions handle it
+            # No need to check if chapter in the collection here, processing functions handle it
             print(f"  Processing Chapter: {chapter}")
             for ct in CARD_TYPES:
                 merge_cards_for_color(
@@ -684,9 +822,24 @@ if __name__ == "__main__":
                     generate_name=f"{chapter}_{ct.name}",
                     mark_completed=True,
                     chapter_list=[chapter],
-                    save_as=SAVE_AS
+                    save_as=SAVE_AS,
+                    collection=collection, config=config, assets=assets
                 )
 
+        # --- Generate Images for Custom Queries ---
+        if CUSTOM_QUERIES: print("\nGenerating images for custom queries...")
+        for query_name, query in CUSTOM_QUERIES.items():
+            merge_cards_for_query(
+                lang=lang, query=query,
+                color_rgb=(255, 255, 255),
+                img_per_row=9,
+                generate_name=query_name,
+                mark_completed=True,
+                chapter_list=ALL_SETS,
+                save_as=SAVE_AS,
+                collection=collection, config=config, assets=assets
+            )
+
         # --- Generate Images for Missing Playsets ---
         print("\nGenerating images for missing playsets...")
         process_missing_chapters = CHAPTERS + SPECIAL_CHAPTERS  # Include all sets
@@ -699,7 +852,8 @@ if __name__ == "__main__":
                 generate_name=f"missing_playsets_{rarity_ct.name}",
                 chapter_list=process_missing_chapters,
                 rarity_filter=rarity_ct.name,
-                save_as=SAVE_AS
+                save_as=SAVE_AS,
+                collection=collection, config=config, assets=assets
             )
 
     print("\n--- Processing Complete ---")
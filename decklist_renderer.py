@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+
+from card_collection import generate_card_key
+from create_collection_per_color import RASTER_FORMATS, AssetContext, RenderConfig, load_card_image, paste_card, save_encoded, save_png
+
+DECKLIST_DIR = "decklists"  # One .txt file per deck; the file name is the deck name
+LANGUAGE = "en"
+DECK_SAVE_AS = ["webp"]
+DECK_SCALING = 0.5  # Deck sheets are for screens and handouts, half the collection sheet size is plenty
+DECK_CARDS_PER_ROW = 10
+DECK_BG_COLOR = (35, 35, 35)
+DECK_WORKERS = None  # None: one process per CPU
+# "4 Elsa - Snow Queen 001/042", "2x Tinker Bell (P1-13)", "1 1TFC/5"; lines starting with # are comments
+DECK_LINE = re.compile(r'^(\d+)\s*x?\s+(?:(.*?)\s+)?\(?([A-Za-z0-9]+)\s*[/-]\s*([A-Za-z]*\d+[A-Za-z]*)\)?$')
+
+# Per worker process: the RenderConfig, the decoded card tiles and the AssetContext
+_worker_state = {}
+
+
+def parse_decklist(name, text, debug=False):
+    """Parse decklist text into {"name": name, "cards": [((set_code, card_key), quantity)], "invalid": [line]}."""
+    cards, invalid = {}, []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"): continue
+        match = DECK_LINE.match(line)
+        if not match:
+            invalid.append(line)
+            continue
+        quantity, _, set_code, card_number = match.groups()
+        # Numeric sets are stored zero padded, like the downloader's set folders
+        set_code = set_code.zfill(3) if set_code.isdigit() else set_code.upper()
+        card = (set_code, generate_card_key(set_code, card_number, debug))
+        cards[card] = cards.get(card, 0) + int(quantity)
+    return {"name": name, "cards": list(cards.items()), "invalid": invalid}
+
+
+def load_decklists(decklist_dir=DECKLIST_DIR, debug=False):
+    """Parse every .txt decklist in a directory."""
+    decks = []
+    for filename in sorted(os.listdir(decklist_dir)):
+        if not filename.lower().endswith(".txt"): continue
+        with open(os.path.join(decklist_dir, filename), 'r', encoding='utf-8') as deck_file:
+            deck = parse_decklist(os.path.splitext(filename)[0], deck_file.read(), debug)
+        if deck["invalid"]:
+            print(f"Warning: {filename}: could not parse {len(deck['invalid'])} line(s), e.g. '{deck['invalid'][0]}'")
+        decks.append(deck)
+    return decks
+
+
+def card_image_paths(lang, base_dir):
+    """Map (set_code, card_key) to the downloaded image of every card of a language."""
+    paths = {}
+    webp_dir = os.path.join(base_dir, lang, "webp")
+    if not os.path.exists(webp_dir): return paths
+    for set_code in os.listdir(webp_dir):
+        set_dir = os.path.join(webp_dir, set_code)
+        for img_filename in os.listdir(set_dir):
+            if img_filename.lower().endswith(".webp") or img_filename.lower().endswith(".png"):
+                paths[(set_code, img_filename.split("_")[0])] = os.path.join(set_dir, img_filename)
+    return paths
+
+
+def _init_worker(config, tiles=None):
+    _worker_state["config"] = config
+    _worker_state["tiles"] = tiles or {}
+    _worker_state["assets"] = AssetContext(config)
+
+
+def _decode_tile(card_and_path):
+    card, img_path = card_and_path
+    try:
+        return card, load_card_image(img_path, _worker_state["config"])
+    except Exception as e:
+        print(f"Error opening image {img_path}: {e}")
+        return card, None
+
+
+@lru_cache(maxsize=None)
+def _quantity_badge(quantity):
+    """Count badge for a quantity, drawn once per worker like the normal count overlay of process_images."""
+    from PIL import Image, ImageDraw
+
+    config, assets = _worker_state["config"], _worker_state["assets"]
+    badge_base, font_count = assets.image("normal_card_count.png"), assets.font(50)
+    if not badge_base: return None
+    badge = badge_base.convert("RGBA").resize((int(badge_base.width * 0.75 * config.scaling), int(badge_base.height * 0.75 * config.scaling)), resample=Image.LANCZOS)
+    draw = ImageDraw.Draw(badge)
+    text = str(quantity)
+    bbox = draw.textbbox((0, 0), text, font=font_count)
+    draw.text(((badge.width - (bbox[2] - bbox[0])) // 2, (badge.height - (bbox[3] - bbox[1])) // 2 - int(10 * config.scaling)), text, font=font_count, fill=(255, 255, 255))
+    return badge
+
+
+def _deck_filename(name):
+    return re.sub(r'[^\w\-. ]', '_', name).strip() or "deck"
+
+
+def _render_deck(task):
+    """Lay out one deck (one tile per unique card with its quantity badge) and save it; returns (name, missing cards)."""
+    from PIL import Image, ImageDraw
+
+    deck, output_dir, save_as = task
+    config, tiles, assets = _worker_state["config"], _worker_state["tiles"], _worker_state["assets"]
+    cards = [(card, quantity) for card, quantity in deck["cards"] if tiles.get(card) is not None]
+    missing = [card for card, _ in deck["cards"] if tiles.get(card) is None]
+    if not cards: return deck["name"], missing
+
+    # The title counts the cards on the sheet; cards without an image are listed in a footer so the difference is visible
+    shown_cards = sum(quantity for _, quantity in cards)
+    missing_entries = [f"{quantity}x {'/'.join(card)}" for card, quantity in deck["cards"] if tiles.get(card) is None]
+    missing_cards = sum(quantity for card, quantity in deck["cards"] if tiles.get(card) is None)
+    title = f"{deck['name']} ({shown_cards})" if not missing_cards else f"{deck['name']} ({shown_cards} of {shown_cards + missing_cards})"
+    footer = f"No image: {', '.join(missing_entries)}" if missing_entries else None
+    title_font, footer_font = assets.font(180), assets.font(60)
+
+    title_height = int(210 * config.scaling)
+    footer_height = int(80 * config.scaling) if footer else 0
+    columns = min(DECK_CARDS_PER_ROW, len(cards))
+    rows = (len(cards) + DECK_CARDS_PER_ROW - 1) // DECK_CARDS_PER_ROW
+    # Wide enough for the title and footer, also for decks with only a few cards
+    text_width = max(title_font.getlength(title), footer_font.getlength(footer) if footer else 0)
+    width = max((config.card_width + config.padding) * columns + config.padding, int(text_width) + 2 * config.padding)
+    height = title_height + (config.card_height + config.padding) * rows + config.padding + footer_height
+    deck_image = Image.new(config.canvas_mode, (width, height), config.canvas_color(DECK_BG_COLOR))
+    draw = ImageDraw.Draw(deck_image)
+    draw.text((config.padding, int(5 * config.scaling)), title, font=title_font, fill=(255, 255, 255))
+    if footer:
+        draw.text((config.padding, height - footer_height - int(config.padding / 2)), footer, font=footer_font, fill=(255, 255, 255))
+
+    for index, (card, quantity) in enumerate(cards):
+        x_offset = config.padding + (index % DECK_CARDS_PER_ROW) * (config.card_width + config.padding)
+        y_offset = title_height + (index // DECK_CARDS_PER_ROW) * (config.card_height + config.padding)
+        paste_card(deck_image, tiles[card], (x_offset, y_offset), config)
+        badge = _quantity_badge(quantity)
+        if badge:
+            deck_image.paste(badge, (x_offset + config.card_width - badge.width - 5, y_offset + 5), badge)
+
+    filename = _deck_filename(deck["name"])
+    for fmt in save_as:
+        output_path = os.path.join(output_dir, fmt, f"{filename}.{fmt}")
+        try:
+            os.makedirs(os.path.join(output_dir, fmt), exist_ok=True)
+            if fmt == "png":
+                save_png(deck_image, output_path, config)
+            else:
+                # Deck sheets are one-off outputs, so searched encoder settings are not recorded
+                save_encoded(deck_image, output_path, fmt, config, record_settings=False)
+        except Exception as e:
+            print(f"Failed to save deck image {output_path}: {e}")
+    return deck["name"], missing
+
+
+def render_decklists(decks, lang, config, workers=None, save_as=None):
+    """
+    Render a batch of parsed decklists to cards/output/decklists/{lang}/{format}/.
+    Every unique card across all decks is decoded and resized once; decoding and deck layout/encoding are
+    spread over a process pool. Returns a summary with the timing and decks per second.
+    """
+    save_as = [fmt for fmt in (config.save_as if save_as is None else save_as) if fmt in RASTER_FORMATS]
+    workers = workers or os.cpu_count() or 1
+    output_dir = os.path.join(config.base_dir, "output", "decklists", lang)
+    image_paths = card_image_paths(lang, config.base_dir)
+    unique_cards = sorted({card for deck in decks for card, _ in deck["cards"]})
+    to_decode = [(card, image_paths[card]) for card in unique_cards if card in image_paths]
+
+    start = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+        tiles = dict(pool.imap_unordered(_decode_tile, to_decode, chunksize=8))
+    decode_seconds = time.perf_counter() - start
+
+    # The decoded tiles are handed to each layout worker once, not per deck
+    missing = {}
+    with Pool(workers, initializer=_init_worker, initargs=(config, tiles)) as pool:
+        for name, missing_cards in pool.imap_unordered(_render_deck, [(deck, output_dir, save_as) for deck in decks], chunksize=4):
+            if missing_cards: missing[name] = missing_cards
+    total_seconds = time.perf_counter() - start
+
+    for name, missing_cards in missing.items():
+        print(f"Warning: {name}: no image for {', '.join('/'.join(card) for card in missing_cards)}")
+    return {
+        "decks": len(decks),
+        "unique_cards": len(unique_cards),
+        "decoded_cards": sum(tile is not None for tile in tiles.values()),
+        "workers": workers,
+        "decode_seconds": decode_seconds,
+        "seconds": total_seconds,
+        "decks_per_second": len(decks) / total_seconds if total_seconds else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python decklist_renderer.py [decklist_dir] [workers]
+    deck_config = RenderConfig(scaling=DECK_SCALING, save_as=DECK_SAVE_AS)
+    deck_batch = load_decklists(sys.argv[1] if len(sys.argv) > 1 else DECKLIST_DIR)
+    if not deck_batch:
+        print("No decklists found.")
+        exit()
+    summary = render_decklists(deck_batch, LANGUAGE, deck_config, int(sys.argv[2]) if len(sys.argv) > 2 else DECK_WORKERS)
+    print(f"Rendered {summary['decks']} decks ({summary['unique_cards']} unique cards, {summary['decoded_cards']} decoded once) "
+          f"in {summary['seconds']:.2f}s with {summary['workers']} processes: {summary['decks_per_second']:.1f} decks/s "
+          f"(decoding {summary['decode_seconds']:.2f}s)")
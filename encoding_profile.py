@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+# Pillow and NumPy are imported where the encoding happens, so importing this module stays cheap
+
+PIL_FORMATS = {"webp": "WebP", "jpg": "JPEG"}
+# WebP methods searched unless a profile lists its own "methods". Method 6 saves another ~2% on card sheets
+# but encodes about 6x slower than 4/5, so it is opt-in. JPEG has no method; trials use optimized Huffman tables.
+WEBP_METHODS = [4, 5]
+DEFAULT_QUALITY = 60
+QUALITY_MIN, QUALITY_MAX = 5, 100
+PROXY_PIXELS = 1000000  # Trial encodes run on a copy downscaled to about this many pixels
+CALIBRATION_ROUNDS = 3  # Full-size encodes allowed to correct the proxy's byte estimate
+SETTINGS_FILENAME = "encoding_settings.json"
+
+
+def _encode(image, fmt, settings):
+    """Encode an image with the given save settings and return the bytes."""
+    buffer = BytesIO()
+    image.save(buffer, PIL_FORMATS[fmt], **settings)
+    return buffer.getvalue()
+
+
+def _ssim(reference, candidate):
+    """Mean SSIM of two equally sized grayscale images, computed over non-overlapping 8x8 blocks."""
+    import numpy as np
+
+    reference, candidate = np.asarray(reference, dtype=np.float64), np.asarray(candidate, dtype=np.float64)
+    height, width = (size // 8 * 8 for size in reference.shape)
+    blocks = [a[:height, :width].reshape(height // 8, 8, width // 8, 8).swapaxes(1, 2).reshape(-1, 64)
+              for a in (reference, candidate)]
+    mean_a, mean_b = blocks[0].mean(axis=1), blocks[1].mean(axis=1)
+    var_a, var_b = blocks[0].var(axis=1), blocks[1].var(axis=1)
+    covariance = ((blocks[0] - mean_a[:, None]) * (blocks[1] - mean_b[:, None])).mean(axis=1)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim = ((2 * mean_a * mean_b + c1) * (2 * covariance + c2)) / ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim.mean())
+
+
+def _proxy(image):
+    """Downscaled copy of the image used for trial encodes."""
+    from PIL import Image
+
+    pixels = image.width * image.height
+    if pixels <= PROXY_PIXELS:
+        return image
+    factor = (PROXY_PIXELS / pixels) ** 0.5
+    return image.resize((max(8, int(image.width * factor)), max(8, int(image.height * factor))), resample=Image.BOX)
+
+
+class _ProxyTrials:
+    """Trial encodes of the proxy, cached by (variant, quality) and run in parallel batches."""
+
+    def __init__(self, proxy, fmt, variants, executor, measure_ssim):
+        self.proxy = proxy
+        self.fmt = fmt
+        self.variants = variants
+        self.executor = executor
+        self.reference = proxy.convert("L") if measure_ssim else None
+        self.results = {}
+
+    def _trial(self, variant_index, quality):
+        from PIL import Image
+
+        data = _encode(self.proxy, self.fmt, dict(self.variants[variant_index], quality=quality))
+        ssim = None
+        if self.reference is not None:
+            with Image.open(BytesIO(data)) as decoded:
+                ssim = _ssim(self.reference, decoded.convert("L"))
+        return len(data), ssim
+
+    def run(self, keys):
+        """Evaluate every (variant_index, quality) not seen yet; returns the results for all keys."""
+        pending = {key: self.executor.submit(self._trial, *key) for key in set(keys) if key not in self.results}
+        for key, future in pending.items():
+            self.results[key] = future.result()
+        return {key: self.results[key] for key in keys}
+
+
+def _search(trials, accept, prefer_high, points):
+    """
+    k-ary search per variant for the highest (prefer_high) or lowest quality whose proxy trial is accepted.
+    accept is monotone in quality; each round tests `points` qualities of every variant at once.
+    Returns {variant_index: quality or None}.
+    """
+    ranges = {variant_index: [QUALITY_MIN, QUALITY_MAX] for variant_index in range(len(trials.variants))}
+    best = dict.fromkeys(ranges)
+    while any(lo <= hi for lo, hi in ranges.values()):
+        keys = [(variant_index, lo + round((hi - lo) * (i + 1) / (points + 1)))
+                for variant_index, (lo, hi) in ranges.items() if lo <= hi for i in range(points)]
+        for (variant_index, quality), result in sorted(trials.run(keys).items()):
+            bounds = ranges[variant_index]
+            if accept(*result):
+                if prefer_high:
+                    best[variant_index] = max(quality, best[variant_index] or quality)
+                    bounds[0] = max(bounds[0], quality + 1)
+                else:
+                    best[variant_index] = min(quality, best[variant_index] or quality)
+                    bounds[1] = min(bounds[1], quality - 1)
+            elif prefer_high:
+                bounds[1] = min(bounds[1], quality - 1)
+            else:
+                bounds[0] = max(bounds[0], quality + 1)
+    return best
+
+
+def _variants(fmt, profile):
+    """Encoder settings besides quality to try for a format."""
+    if fmt == "webp":
+        return [{"method": method} for method in profile.get("methods", WEBP_METHODS)]
+    return [{"optimize": True}]
+
+
+def search_settings(image, fmt, profile, workers=None):
+    """
+    Find encoder settings for an image that meet the profile; returns (encoded bytes, settings).
+    {"max_bytes": n}: the highest quality whose full-size output fits in n bytes. The proxy's byte count is
+    scaled to the full image, then corrected with the full-size result for up to CALIBRATION_ROUNDS encodes.
+    {"min_ssim": s}: the smallest output whose proxy keeps an SSIM of at least s against the uncompressed proxy.
+    """
+    workers = workers or os.cpu_count() or 1
+    proxy = _proxy(image)
+    variants = _variants(fmt, profile)
+    points = max(1, workers // len(variants))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        trials = _ProxyTrials(proxy, fmt, variants, executor, "min_ssim" in profile)
+
+        if "min_ssim" in profile:
+            best = _search(trials, lambda size, ssim: ssim >= profile["min_ssim"], False, points)
+            candidates = [(trials.results[(v, q)][0], v, q) for v, q in best.items() if q is not None]
+            # Nothing reaches the floor: fall back to the best quality of the default variant
+            _, variant_index, quality = min(candidates) if candidates else (0, 0, QUALITY_MAX)
+            settings = dict(variants[variant_index], quality=quality)
+            return _encode(image, fmt, settings), settings
+
+        max_bytes = profile["max_bytes"]
+        bytes_per_proxy_byte = image.width * image.height / (proxy.width * proxy.height)
+        fitting, smallest = None, None
+        for _ in range(CALIBRATION_ROUNDS):
+            proxy_budget = max_bytes / bytes_per_proxy_byte
+            best = _search(trials, lambda size, ssim: size <= proxy_budget, True, points)
+            # Highest quality wins; on a tie the first (faster) variant
+            fits = [(v, q) for v, q in best.items() if q is not None]
+            variant_index, quality = max(fits, key=lambda vq: (vq[1], -vq[0])) if fits else (0, QUALITY_MIN)
+            settings = dict(variants[variant_index], quality=quality)
+            if smallest and settings in (smallest[1], fitting and fitting[1]):
+                break  # The corrected budget leads back to settings already encoded at full size
+            data = _encode(image, fmt, settings)
+            if len(data) <= max_bytes and (fitting is None or quality > fitting[1]["quality"]):
+                fitting = (data, settings)
+            if smallest is None or len(data) < len(smallest[0]):
+                smallest = (data, settings)
+            # Stop once the output fits with less than 10% of the budget unused
+            if len(data) <= max_bytes and (len(data) >= 0.9 * max_bytes or quality == QUALITY_MAX):
+                break
+            bytes_per_proxy_byte = len(data) / trials.results[(variant_index, quality)][0]
+        if fitting is None:
+            print(f"Warning: no {fmt} settings reach {max_bytes} bytes, using the smallest output ({len(smallest[0])} bytes)")
+        return fitting or smallest
+
+
+class EncodingSettings:
+    """Chosen encoder settings per output file, persisted so later runs skip the search."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as settings_file:
+                self.outputs = json.load(settings_file)
+        except (FileNotFoundError, ValueError):
+            self.outputs = {}
+
+    def get(self, output_key, profile, size):
+        """The record ({"settings", "bytes", ...}) for output_key if it was made for this profile and size."""
+        record = self.outputs.get(output_key)
+        if record and record["profile"] == profile and record["size"] == list(size):
+            return record
+        return None
+
+    def put(self, output_key, profile, size, settings, byte_count):
+        self.outputs[output_key] = {"profile": profile, "size": list(size), "settings": settings, "bytes": byte_count}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as settings_file:
+            json.dump(self.outputs, settings_file, indent=1, sort_keys=True)
+
+
+def encode_with_profile(image, fmt, profile, settings_store=None, output_key=None, workers=None):
+    """
+    Encode an image as "webp" or "jpg" following an encoding profile; returns the bytes.
+    {"quality": q} encodes directly. For "max_bytes"/"min_ssim" profiles the settings recorded for output_key are
+    reused when the profile and image size are unchanged and the output still fits max_bytes, else searched again.
+    Settings recorded for an unreachable max_bytes (the smallest output) are reused as long as they still do not fit,
+    since a new search would end at the same settings.
+    """
+    if fmt == "jpg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    if "quality" in profile or not profile:
+        return _encode(image, fmt, {"quality": profile.get("quality", DEFAULT_QUALITY)})
+
+    record = settings_store.get(output_key, profile, image.size) if settings_store else None
+    if record:
+        data = _encode(image, fmt, record["settings"])
+        if "max_bytes" not in profile or len(data) <= profile["max_bytes"]:
+            print(f"Reusing {fmt} settings {record['settings']} for {output_key}")
+            return data
+        if record["bytes"] > profile["max_bytes"]:
+            print(f"Warning: {fmt} output for {output_key} still exceeds {profile['max_bytes']} bytes, reusing the smallest settings {record['settings']}")
+            return data
+
+    data, settings = search_settings(image, fmt, profile, workers)
+    print(f"Chose {fmt} settings {settings} for {output_key or 'image'} ({len(data)} bytes)")
+    if settings_store:
+        settings_store.put(output_key, profile, image.size, settings, len(data))
+    return data
+
+
+if __name__ == "__main__":
+    # Usage: python encoding_profile.py image [max_bytes|min_ssim] [workers] - search settings for one image
+    from PIL import Image
+
+    target = float(sys.argv[2]) if len(sys.argv) > 2 else 0.95
+    benchmark_profile = {"min_ssim": target} if target < 1 else {"max_bytes": int(target)}
+    with Image.open(sys.argv[1]) as source:
+        source.load()
+        for output_format in PIL_FORMATS:
+            start = time.perf_counter()
+            encoded = encode_with_profile(source, output_format, benchmark_profile, workers=int(sys.argv[3]) if len(sys.argv) > 3 else None)
+            print(f"{output_format}: {len(encoded)} bytes in {time.perf_counter() - start:.2f}s "
+                  f"(fixed quality {DEFAULT_QUALITY}: {len(encode_with_profile(source, output_format, {}))} bytes)")
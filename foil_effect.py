@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import os
+
+# NumPy and Pillow are imported where the effect is drawn, so importing this module stays cheap
+
+FOIL_SUBDIR = "foil"  # cards/{lang}/foil/{set_id}/{card_key}.{webp,png,jpg}, next to cards/{lang}/webp/{set_id}/
+FOIL_MASK_EXTENSIONS = (".webp", ".png", ".jpg")  # Stored with the extension of the format the API sends
+FOIL_STRENGTH = 0.45  # Opacity of the rainbow where the mask is white
+FOIL_BAND_WIDTH = 900  # Pixels (at scaling 1) for one full hue cycle along the diagonal
+FOIL_FRAMES = 8  # Frames of the animated sheen; the hue shifts by one cycle over the loop
+FOIL_FRAME_MS = 120
+
+
+def foil_mask_path(base_dir, lang, set_id, card_key, extension=".webp"):
+    """Where the downloader stores the foil mask of a card in the given format."""
+    return os.path.join(base_dir, lang, FOIL_SUBDIR, set_id, f"{card_key}{extension}")
+
+
+def find_foil_mask(base_dir, lang, set_id, card_key):
+    """Path of a card's stored foil mask in whichever format it was downloaded, or None."""
+    for extension in FOIL_MASK_EXTENSIONS:
+        mask_path = foil_mask_path(base_dir, lang, set_id, card_key, extension)
+        if os.path.exists(mask_path):
+            return mask_path
+    return None
+
+
+def load_foil_mask(mask_path, size, corner_mask):
+    """
+    Foil mask of a card as an 'L' image of the card size, limited to the rounded card shape.
+    Masks with transparency use their alpha channel, others their brightness; a card without a mask file
+    (mask_path None) gets the sheen over the whole card. Always a new image, so badges can be cut out of it.
+    """
+    from PIL import Image, ImageChops
+
+    if mask_path is None:
+        return corner_mask.copy()
+    try:
+        with Image.open(mask_path) as mask_img:
+            if mask_img.mode in ("RGBA", "LA") and mask_img.getextrema()[-1][0] < 255:
+                mask = mask_img.getchannel("A")
+            else:
+                mask = mask_img.convert("L")
+            mask = mask.resize(size, resample=Image.BILINEAR)
+    except Exception as e:
+        print(f"Warning: Error opening foil mask {mask_path}: {e}. Using the whole card.")
+        return corner_mask.copy()
+    return ImageChops.multiply(mask, corner_mask)
+
+
+def _rainbow_line(start, length, band_width, phase):
+    """
+    Rainbow colors for diagonal positions start .. start + length - 1 as float32 RGB in [0, 255].
+    The hue cycles once every band_width pixels; phase in [0, 1) shifts it.
+    """
+    import numpy as np
+
+    hue = (np.arange(start, start + length) / band_width + phase) % 1.0
+    return np.stack([127.5 + 127.5 * np.cos(2 * np.pi * (hue - offset)) for offset in (0, 1 / 3, 2 / 3)], axis=1).astype(np.float32)
+
+
+class FoilLayer:
+    """Foil masks placed on a composite, applied one grid row at a time."""
+
+    def __init__(self, scaling=1):
+        self.band_width = max(1, int(FOIL_BAND_WIDTH * scaling))
+        self.rows = {}  # (y, height) -> [(x, mask)]
+
+    def add(self, x, y, mask):
+        """Place a card's foil mask with its top left corner at (x, y); cards of one grid row share y."""
+        self.rows.setdefault((y, mask.height), []).append((x, mask))
+
+    def offset(self, dy):
+        """Move everything added so far down by dy (when the grid it belongs to is merged into a taller image)."""
+        self.rows = {(y + dy, height): cards for (y, height), cards in self.rows.items()}
+
+    def extend(self, other):
+        for key, cards in other.rows.items():
+            self.rows.setdefault(key, []).extend(cards)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def apply(self, image, phase=0.0):
+        """
+        Screen a diagonal rainbow through the masks onto image (in place) and return it.
+        Each grid row is one NumPy pass over the pixels its foil masks cover; phase in [0, 1) shifts the hue.
+        """
+        import numpy as np
+        from numpy.lib.stride_tricks import as_strided
+        from PIL import Image
+
+        for (y, height), cards in self.rows.items():
+            x0 = min(x for x, _ in cards)
+            x1 = max(x + mask.width for x, mask in cards)
+            row_mask = Image.new("L", (x1 - x0, height), 0)
+            for x, mask in cards:
+                row_mask.paste(mask, (x - x0, 0))
+
+            # The color only depends on x + y, so the whole strip is a strided view of one line of colors (no copy)
+            line = _rainbow_line(x0 + y, x1 - x0 + height - 1, self.band_width, phase) * (FOIL_STRENGTH / 255 / 255)
+            rainbow = as_strided(line, shape=(height, x1 - x0, 3), strides=(line.strides[0], line.strides[0], line.strides[1]))
+            strip = np.asarray(image.crop((x0, y, x1, y + height)))
+            # Screen blend weighted by the mask: base + (255 - base) * color / 255 * strength * mask / 255;
+            # it only brightens towards the rainbow color, never darkens the art
+            blended = (255 - strip[:, :, :3]).astype(np.float32)
+            blended *= rainbow
+            blended *= np.asarray(row_mask, dtype=np.float32)[:, :, None]
+            blended += strip[:, :, :3]
+            blended += 0.5
+            strip = strip.copy()
+            strip[:, :, :3] = blended.astype(np.uint8)
+            image.paste(Image.fromarray(strip), (x0, y))
+        return image
+
+    def frames(self, image, frame_count=FOIL_FRAMES):
+        """Copies of image with the sheen at evenly spaced phases, for an animated loop."""
+        return [self.apply(image.copy(), index / frame_count) for index in range(frame_count)]
+
+
+def save_animated_webp(frames, path, quality, frame_ms=FOIL_FRAME_MS):
+    """Save frames as a looping animated WebP."""
+    frames[0].save(path, "WebP", save_all=True, append_images=frames[1:], duration=frame_ms, loop=0, quality=quality)
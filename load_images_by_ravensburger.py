@@ -1,8 +1,10 @@
 import os
 from io import BytesIO
 
-import requests
-from PIL import Image
+# requests and Pillow are imported where they are used, so importing this module (e.g. for Card) stays cheap
+from card_search import build_card_index, card_document, save_card_index
+from catalog_snapshot import SNAPSHOT_PATH, SnapshotWriter, start_mock_server
+from foil_effect import FOIL_MASK_EXTENSIONS, foil_mask_path
 
 EXTRACTED_CARDS = {}
 
@@ -10,6 +12,10 @@ LOGIN_URL = "https://sso.ravensburger.de/token"
 CATALOG_URL = "https://api.lorcana.ravensburger.com/v2/catalog/{lang}"
 
 DEBUG = False
+# None: use the live API, "record": also save catalogs and images to SNAPSHOT_PATH,
+# "replay": serve SNAPSHOT_PATH from a local stand-in server instead of the API (offline, reproducible)
+SNAPSHOT_MODE = None
+DOWNLOAD_FOIL_MASKS = True  # Store each card's foil mask for the renderer's foil effect
 DEBUG_CARDS = [("D23", "006"), ("Q1", "001"), ("001", "001")]  # Ensure IDs are properly zero-padded
 
 CARD_RARITY = {
@@ -34,6 +40,21 @@ LANGUAGES = [
 ]
 
 
+class DownloadConfig:
+    """Settings of a download run; snapshot is the SnapshotWriter while recording."""
+
+    def __init__(self, languages=None, debug=False, debug_cards=None, login_url=LOGIN_URL, catalog_url=CATALOG_URL, snapshot=None, base_dir="cards",
+                 foil_masks=DOWNLOAD_FOIL_MASKS):
+        self.languages = list(LANGUAGES if languages is None else languages)
+        self.debug = debug
+        self.debug_cards = list(DEBUG_CARDS if debug_cards is None else debug_cards)
+        self.login_url = login_url
+        self.catalog_url = catalog_url
+        self.snapshot = snapshot
+        self.base_dir = base_dir
+        self.foil_masks = foil_masks
+
+
 class Card:
     def __init__(self, card_data, card_type, card_set, special_rarities):
         # Common fields
@@ -69,7 +90,9 @@ class Card:
 
         # Image URLs
         image_urls = card_data.get('image_urls', [])
-        self.high_res_image = next((img['url'] for img in image_urls if img['height'] == 2048), None)
+        high_res = next((img for img in image_urls if img['height'] == 2048), None)
+        self.high_res_image = high_res['url'] if high_res else None
+        self.high_res_size = (high_res.get('width'), high_res['height']) if high_res else None  # width may be missing
         self.foil_mask_url = card_data.get('foil_mask_url', None)
 
         # Subtypes and additional information
@@ -99,8 +122,10 @@ def map_card_sets_to_dict(card_sets):
     return {card_set['id']: card_set['name'] for card_set in card_sets}
 
 
-def do_sso_ravensburger(access_token):
+def do_sso_ravensburger(access_token, config):
     """Get the token from Ravensburger's SSO."""
+    import requests
+
     payload = {
         'grant_type': 'client_credentials'
     }
@@ -110,11 +135,11 @@ def do_sso_ravensburger(access_token):
     }
 
     # Send POST request to get the token
-    response = requests.post(LOGIN_URL, headers=headers, data=payload)
+    response = requests.post(config.login_url, headers=headers, data=payload)
 
     # Check if the response is successful
     if response.status_code == 200:
-        if DEBUG:
+        if config.debug:
             print(f"SSO Response: {response.text}")
         return response.json().get('access_token')
     else:
@@ -122,11 +147,13 @@ def do_sso_ravensburger(access_token):
         raise Exception(f"Failed to retrieve token: {response.status_code}, {response.text}")
 
 
-def get_catalog():
+def get_catalog(config):
     """Get the catalog using the token."""
-    token = do_sso_ravensburger('Basic bG9yY2FuYS1hcGktcmVhZDpFdkJrMzJkQWtkMzludWt5QVNIMHc2X2FJcVZEcHpJenVrS0lxcDlBNXRlb2c5R3JkQ1JHMUFBaDVSendMdERkYlRpc2k3THJYWDl2Y0FkSTI4S096dw==')
+    import requests
 
-    if DEBUG:
+    token = do_sso_ravensburger('Basic bG9yY2FuYS1hcGktcmVhZDpFdkJrMzJkQWtkMzludWt5QVNIMHc2X2FJcVZEcHpJenVrS0lxcDlBNXRlb2c5R3JkQ1JHMUFBaDVSendMdERkYlRpc2k3THJYWDl2Y0FkSTI4S096dw==', config)
+
+    if config.debug:
         print(f"Access Token: {token}")
 
     headers = {
@@ -135,14 +162,16 @@ def get_catalog():
 
     response_by_language = {}
 
-    for lang in LANGUAGES:
+    for lang in config.languages:
         # Send GET request to fetch the catalog
-        response = requests.get(CATALOG_URL.replace("{lang}", lang), headers=headers)
+        response = requests.get(config.catalog_url.replace("{lang}", lang), headers=headers)
 
         # Check if the response is successful
         if response.status_code == 200:
             # Return the catalog data
             response_by_language[lang] = response.json()
+            if config.snapshot:
+                config.snapshot.add_catalog(lang, response_by_language[lang])
         else:
             # Raise an exception if the request failed
             raise Exception(f"Failed to retrieve catalog: {response.status_code}, {response.text}")
@@ -150,59 +179,127 @@ def get_catalog():
     return response_by_language
 
 
-def fill_card_catalog():
+def fill_card_catalog(config):
     """Fill the card catalog by fetching data and downloading images."""
-    card_catalog = get_catalog()
+    card_catalog = get_catalog(config)
 
-    if DEBUG:
+    if config.debug and "en" in card_catalog:
         print(map_card_sets_to_dict(card_catalog["en"]["card_sets"]), map_card_sets_to_dict(card_catalog["en"]["special_rarities"]))
 
-    for lang in LANGUAGES:
-        # Determine card types
-        for card_type, cards in card_catalog[lang]["cards"].items():
-            for card in cards:
-                card_data = Card(
-                    card,
-                    card_type,
-                    map_card_sets_to_dict(card_catalog[lang]["card_sets"]),
-                    map_card_sets_to_dict(card_catalog[lang]["special_rarities"])
-                )
-
-                # Prepare the tuple for comparison
-                card_tuple = (card_data.set_id, card_data.id)
-
-                # If DEBUG is True, only process cards in DEBUG_CARDS
-                if DEBUG:
-                    if card_tuple not in DEBUG_CARDS:
-                        continue  # Skip this card
-                    else:
-                        # Print debug info only when handling debug cards
-                        print(f"Processing Debug Card: {card_data}")
-
-                # In non-debug mode, avoid printing every card
-                elif not DEBUG:
-                    print(f"Processing Card: {card_data.name} ({card_data.id})")
-
-                # Proceed to download and save images
-                card_image = download_image(card_data.high_res_image)
-                save_image(
-                    os.path.join("cards", lang, "webp", card_data.set_id),
-                    f"{card_data.id}_{'&'.join(card_data.magic_ink_colors)}_{CARD_RARITY.get(card_data.rarity, 'XX')}_{card_data.card_type}",
-                    card_image,
-                    "webp"
-                )
-
-
-def download_image(url):
+    for lang in config.languages:
+        search_documents = {}
+
+        for card_data in catalog_cards(card_catalog, lang):
+            # Prepare the tuple for comparison
+            card_tuple = (card_data.set_id, card_data.id)
+
+            # If DEBUG is True, only process cards in DEBUG_CARDS
+            if config.debug:
+                if card_tuple not in config.debug_cards:
+                    continue  # Skip this card
+                else:
+                    # Print debug info only when handling debug cards
+                    print(f"Processing Debug Card: {card_data}")
+
+            # In non-debug mode, avoid printing every card
+            elif not config.debug:
+                print(f"Processing Card: {card_data.name} ({card_data.id})")
+
+            rarity_code = CARD_RARITY.get(card_data.rarity, 'XX')
+            search_documents[f"{card_data.set_id}/{card_data.id}"] = card_document(card_data, rarity_code)
+
+            # Proceed to download and save images
+            download_card(card_data, lang, config)
+
+        # Persist the search index so views can be built from queries without the API
+        index_path = save_card_index(build_card_index(search_documents), lang, config.base_dir)
+        print(f"Search index saved: {index_path} ({len(search_documents)} cards)")
+
+
+def catalog_cards(card_catalog, lang):
+    """Yield a Card for every card of a language's catalog."""
+    card_sets = map_card_sets_to_dict(card_catalog[lang]["card_sets"])
+    special_rarities = map_card_sets_to_dict(card_catalog[lang]["special_rarities"])
+    # Determine card types
+    for card_type, cards in card_catalog[lang]["cards"].items():
+        for card in cards:
+            yield Card(card, card_type, card_sets, special_rarities)
+
+
+def card_image_path(base_dir, lang, card_data):
+    """Where a card's art is stored: cards/{lang}/webp/{set_id}/{id}_{colors}_{rarity}_{type}.webp."""
+    rarity_code = CARD_RARITY.get(card_data.rarity, 'XX')
+    image_name = f"{card_data.id}_{'&'.join(card_data.magic_ink_colors)}_{rarity_code}_{card_data.card_type}"
+    return os.path.join(base_dir, lang, "webp", card_data.set_id, f"{image_name}.webp")
+
+
+def download_card(card_data, lang, config):
+    """Download and save a card's art and, if enabled, its foil mask."""
+    image_path = card_image_path(config.base_dir, lang, card_data)
+    card_image = download_image(card_data.high_res_image, config)
+    save_image(os.path.dirname(image_path), os.path.splitext(os.path.basename(image_path))[0], card_image, "webp")
+    if config.foil_masks and card_data.foil_mask_url:
+        download_foil_mask(card_data, lang, config)
+
+
+def download_image(url, config):
     """Download an image from the given URL."""
+    import requests
+
     response = requests.get(url)
     if response.status_code == 200:
+        if config.snapshot:
+            config.snapshot.add_image(url, response.content)
         return response.content
     else:
         # Raise an exception if the request failed
         raise Exception(f"Failed to retrieve image: {response.status_code}, {response.text}")
 
 
+def image_extension(url, image_content):
+    """File extension of a downloaded image: from the URL, else from the file signature."""
+    extension = os.path.splitext(url.split("?")[0])[1].lower()
+    if extension == ".jpeg":
+        return ".jpg"
+    if extension in FOIL_MASK_EXTENSIONS:
+        return extension
+    if image_content[:4] == b"RIFF" and image_content[8:12] == b"WEBP":
+        return ".webp"
+    if image_content.startswith(b"\x89PNG"):
+        return ".png"
+    if image_content.startswith(b"\xff\xd8"):
+        return ".jpg"
+    return None
+
+
+def download_foil_mask(card_data, lang, config):
+    """Download a card's foil mask next to its art; a missing mask only costs the card its foil effect."""
+    try:
+        mask_content = download_image(card_data.foil_mask_url, config)
+    except Exception as e:
+        print(f"Warning: Failed to retrieve foil mask for {card_data.set_id}/{card_data.id}: {e}")
+        return
+    extension = image_extension(card_data.foil_mask_url, mask_content)
+    if extension is None:
+        print(f"Warning: Unknown image format of the foil mask for {card_data.set_id}/{card_data.id}, skipping it")
+        return
+    mask_path = foil_mask_path(config.base_dir, lang, card_data.set_id, card_data.id, extension)
+    # A mask stored earlier in another format would shadow the new one
+    for other_extension in FOIL_MASK_EXTENSIONS:
+        stale_path = foil_mask_path(config.base_dir, lang, card_data.set_id, card_data.id, other_extension)
+        if other_extension != extension and os.path.exists(stale_path):
+            os.remove(stale_path)
+    write_file(mask_path, mask_content)
+
+
+def write_file(path, content):
+    """Write a downloaded file under a temporary name first, so an interrupted run never leaves a truncated file behind."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".part", 'wb') as file:
+        file.write(content)
+    os.replace(path + ".part", path)
+
+
 def save_image(directory, image_name, image_content, format):
     """Save the image to the specified directory with the given format."""
     # Create the directory if it doesn't exist
@@ -212,16 +309,40 @@ def save_image(directory, image_name, image_content, format):
     path = os.path.join(directory, image_name)
 
     if format == "webp":
-        with open(path + ".webp", 'wb') as file:
-            file.write(image_content)
+        write_file(path + ".webp", image_content)
     elif format == "png":
+        from PIL import Image
         image = Image.open(BytesIO(image_content))
         image.save(path + ".png", "PNG")
 
 
+def start_snapshot(config, mode=SNAPSHOT_MODE):
+    """Set up recording or replay (see SNAPSHOT_MODE) on a config; returns the mock server to pass to stop_snapshot."""
+    mock_server = None
+    if mode == "record":
+        config.snapshot = SnapshotWriter(SNAPSHOT_PATH)
+    elif mode == "replay":
+        mock_server, base_url = start_mock_server(SNAPSHOT_PATH)
+        config.login_url, config.catalog_url = f"{base_url}/token", f"{base_url}/v2/catalog/{{lang}}"
+        print(f"Replaying snapshot {SNAPSHOT_PATH} from {base_url}")
+    return mock_server
+
+
+def stop_snapshot(config, mock_server):
+    if config.snapshot:
+        config.snapshot.close()
+    if mock_server:
+        mock_server.shutdown()
+
+
 def main():
     """Main function to start the process."""
-    fill_card_catalog()
+    config = DownloadConfig(debug=DEBUG)
+    mock_server = start_snapshot(config)
+    try:
+        fill_card_catalog(config)
+    finally:
+        stop_snapshot(config, mock_server)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import os
+import zlib
+from io import BytesIO
+
+# Page geometry (PDF points), 9-pocket binder layout on A4
+MM = 72 / 25.4
+PAGE_WIDTH, PAGE_HEIGHT = 210 * MM, 297 * MM
+CARD_WIDTH_PT, CARD_HEIGHT_PT = 63 * MM, 88 * MM
+GUTTER_PT = 2 * MM
+CARDS_PER_ROW, ROWS_PER_PAGE = 3, 3
+CARDS_PER_PAGE = CARDS_PER_ROW * ROWS_PER_PAGE
+TITLE_FONT_SIZE = 11
+
+# Embedded card images: 300 dpi at 63x88 mm
+EMBED_WIDTH, EMBED_HEIGHT = 744, 1039
+JPEG_QUALITY = 85
+
+# Width of digits and average glyph in Helvetica-Bold (1/1000 em), used to center badge text
+DIGIT_WIDTH = 556
+AVERAGE_WIDTH = 600
+
+
+def _pdf_string(text):
+    """Encode text as a PDF literal string."""
+    raw = str(text).encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class StreamingPdfWriter:
+    """
+    Minimal PDF writer that streams pages to disk as they are finished.
+    Every page inherits one shared resource dictionary from the page tree, which is written on close,
+    so an image registered once under a key is embedded a single time no matter how many pages use it.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.offsets = {}
+        self.next_id = 3  # 1 = catalog, 2 = page tree, both written on close
+        self.page_ids = []
+        self.images = {}
+        self.alpha_states = {}
+        self.font_id = None
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def _write_object(self, body, stream=None, obj_id=None):
+        if obj_id is None:
+            obj_id = self.next_id
+            self.next_id += 1
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(f"{obj_id} 0 obj\n".encode())
+        if stream is None:
+            self.file.write(body + b"\nendobj\n")
+        else:
+            self.file.write(body[:-2] + f" /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream\nendobj\n")
+        return obj_id
+
+    def image(self, key, loader):
+        """Return the resource name for the image under key, embedding loader()'s result on first use."""
+        if key in self.images:
+            return self.images[key][0]
+        image = loader()
+        if image is None:
+            return None
+        width, height = image.size
+        smask = b""
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            image = image.convert("RGBA")
+            alpha_id = self._write_object(
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode >>".encode(),
+                zlib.compress(image.getchannel("A").tobytes()))
+            smask = f" /SMask {alpha_id} 0 R".encode()
+            rgb = image.convert("RGB")
+            body = f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode".encode() + smask + b" >>"
+            stream = zlib.compress(rgb.tobytes())
+        else:
+            buffer = BytesIO()
+            image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY)
+            body = f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode >>".encode()
+            stream = buffer.getvalue()
+        name = f"Im{len(self.images) + 1}"
+        self.images[key] = (name, self._write_object(body, stream))
+        return name
+
+    def alpha_state(self, alpha):
+        """Return the graphics state name for a fill opacity (0-255)."""
+        if alpha not in self.alpha_states:
+            state_id = self._write_object(f"<< /Type /ExtGState /ca {alpha / 255:.3f} >>".encode())
+            self.alpha_states[alpha] = (f"GS{len(self.alpha_states) + 1}", state_id)
+        return self.alpha_states[alpha][0]
+
+    def font(self):
+        """Return the resource name of the (standard, non-embedded) bold font."""
+        if self.font_id is None:
+            self.font_id = self._write_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        return "F1"
+
+    def add_page(self, content):
+        """Write one finished page (its content stream) to disk."""
+        content_id = self._write_object(b"<< /Filter /FlateDecode >>", zlib.compress(content))
+        page_id = self._write_object(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH:.2f} {PAGE_HEIGHT:.2f}] /Contents {content_id} 0 R >>".encode())
+        self.page_ids.append(page_id)
+
+    def close(self):
+        """Write the page tree, shared resources, catalog and cross-reference table."""
+        xobjects = " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in self.images.values())
+        states = " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in self.alpha_states.values())
+        fonts = f"/F1 {self.font_id} 0 R" if self.font_id else ""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} /Resources << /XObject << {xobjects} >> /ExtGState << {states} >> /Font << {fonts} >> >> >>".encode(),
+            obj_id=2)
+        self._write_object(b"<< /Type /Catalog /Pages 2 0 R >>", obj_id=1)
+
+        xref_offset = self.file.tell()
+        self.file.write(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, self.next_id):
+            self.file.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+        self.file.write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        self.file.close()
+
+
+def _rounded_rect(x, y, w, h, r):
+    """Path operators for a rounded rectangle."""
+    k = 0.5523 * r
+    return (f"{x + r:.2f} {y:.2f} m {x + w - r:.2f} {y:.2f} l {x + w - r + k:.2f} {y:.2f} {x + w:.2f} {y + r - k:.2f} {x + w:.2f} {y + r:.2f} c "
+            f"{x + w:.2f} {y + h - r:.2f} l {x + w:.2f} {y + h - r + k:.2f} {x + w - r + k:.2f} {y + h:.2f} {x + w - r:.2f} {y + h:.2f} c "
+            f"{x + r:.2f} {y + h:.2f} l {x + r - k:.2f} {y + h:.2f} {x:.2f} {y + h - r + k:.2f} {x:.2f} {y + h - r:.2f} c "
+            f"{x:.2f} {y + r:.2f} l {x:.2f} {y + r - k:.2f} {x + r - k:.2f} {y:.2f} {x + r:.2f} {y:.2f} c h")
+
+
+def _load_card(img_path):
+    """Open a card image and downscale it to the embedded print resolution."""
+    from PIL import Image
+
+    try:
+        with Image.open(img_path) as img:
+            return img.convert("RGB").resize((EMBED_WIDTH, EMBED_HEIGHT), resample=Image.LANCZOS)
+    except Exception as e:
+        print(f"Error opening image {img_path}: {e}")
+        return None
+
+
+def _load_asset(asset_path):
+    from PIL import Image
+
+    try:
+        return Image.open(asset_path).convert("RGBA")
+    except Exception as e:
+        print(f"Warning: Error loading asset {asset_path}: {e}")
+        return None
+
+
+def _card_content(writer, card, x, y, px_to_pt, corner_radius_pt):
+    """Content stream operators for one card slot with its tint and badges."""
+    ops = []
+    image_name = writer.image(card["img_path"], lambda: _load_card(card["img_path"]))
+    clip = _rounded_rect(x, y, CARD_WIDTH_PT, CARD_HEIGHT_PT, corner_radius_pt)
+    if image_name:
+        ops.append(f"q {clip} W n {CARD_WIDTH_PT:.2f} 0 0 {CARD_HEIGHT_PT:.2f} {x:.2f} {y:.2f} cm /{image_name} Do Q")
+    if card.get("tint"):
+        r, g, b, a = card["tint"]
+        ops.append(f"q /{writer.alpha_state(a)} gs {r / 255:.3f} {g / 255:.3f} {b / 255:.3f} rg {clip} f Q")
+
+    for badge in card.get("badges", []):
+        badge_name = writer.image(badge["asset"], lambda: _load_asset(badge["asset"]))
+        bx, by, bw, bh = badge["box"]
+        left, width, height = x + bx * px_to_pt, bw * px_to_pt, bh * px_to_pt
+        bottom = y + CARD_HEIGHT_PT - (by + bh) * px_to_pt
+        if badge_name:
+            ops.append(f"q {width:.2f} 0 0 {height:.2f} {left:.2f} {bottom:.2f} cm /{badge_name} Do Q")
+        if badge.get("text") is not None:
+            text = str(badge["text"])
+            font_size = badge["font_size"] * px_to_pt
+            glyph_width = DIGIT_WIDTH if text.isdigit() else AVERAGE_WIDTH
+            text_x = left + (width - len(text) * glyph_width / 1000 * font_size) / 2
+            text_y = bottom + height / 2 - 0.35 * font_size + badge.get("text_raise", 0) * px_to_pt
+            ops.append(f"BT /{writer.font()} {font_size:.2f} Tf 1 1 1 rg {text_x:.2f} {text_y:.2f} Td {_pdf_string(text).decode('latin-1')} Tj ET")
+    return ops
+
+
+def save_binder_pdf(pdf_path, sections, card_size, corner_radius=0):
+    """
+    Write cards as 3x3 binder pages, streaming one page at a time.
+    sections: list of (title, cards); each section starts on a new page.
+    Each card is a dict with 'img_path', optional 'tint' (r, g, b, a) and 'badges', a list of
+    {'asset', 'box': (x, y, w, h) in card pixels, 'text', 'font_size', 'text_raise'} dicts.
+    card_size is the card size in pixels the boxes are expressed in.
+    """
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    px_to_pt = CARD_WIDTH_PT / card_size[0]
+    corner_radius_pt = corner_radius * px_to_pt
+    grid_width = CARDS_PER_ROW * CARD_WIDTH_PT + (CARDS_PER_ROW - 1) * GUTTER_PT
+    grid_height = ROWS_PER_PAGE * CARD_HEIGHT_PT + (ROWS_PER_PAGE - 1) * GUTTER_PT
+    margin_x = (PAGE_WIDTH - grid_width) / 2
+    margin_y = (PAGE_HEIGHT - grid_height) / 2
+    page_count = 0
+
+    with StreamingPdfWriter(pdf_path) as writer:
+        for title, cards in sections:
+            for page_start in range(0, len(cards), CARDS_PER_PAGE):
+                ops = []
+                if title:
+                    ops.append(f"BT /{writer.font()} {TITLE_FONT_SIZE} Tf 0 0 0 rg {margin_x:.2f} {PAGE_HEIGHT - margin_y + TITLE_FONT_SIZE / 2:.2f} Td {_pdf_string(title).decode('latin-1')} Tj ET")
+                for slot, card in enumerate(cards[page_start:page_start + CARDS_PER_PAGE]):
+                    col, row = slot % CARDS_PER_ROW, slot // CARDS_PER_ROW
+                    x = margin_x + col * (CARD_WIDTH_PT + GUTTER_PT)
+                    y = PAGE_HEIGHT - margin_y - (row + 1) * CARD_HEIGHT_PT - row * GUTTER_PT
+                    ops.extend(_card_content(writer, card, x, y, px_to_pt, corner_radius_pt))
+                writer.add_page("\n".join(ops).encode("latin-1"))
+                page_count += 1
+
+    return page_count
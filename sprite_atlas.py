@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import math
+import os
+import re
+
+BASE_DIR = "cards"
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+ATLAS_SUBDIR = "atlas"
+# Atlas tiles are stored at half the composite card size, which keeps chapter atlases below WebP's 16383px limit
+ATLAS_SCALE = 0.5
+ATLAS_QUALITY = 85
+
+# SHA-1 of card files by (path, size, mtime), so views sharing a chapter read its files only once per run
+_file_digests = {}
+
+
+def _chapter_files(chapter_dir):
+    """Card image filenames of a chapter, sorted by card key."""
+    filenames = [f for f in os.listdir(chapter_dir) if f.lower().endswith(".webp") or f.lower().endswith(".png")]
+    return sorted(filenames, key=lambda f: f.split("_")[0])
+
+
+def _file_digest(path):
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _file_digests:
+        with open(path, 'rb') as card_file:
+            _file_digests[key] = hashlib.sha1(card_file.read()).hexdigest()
+    return _file_digests[key]
+
+
+def _atlas_fingerprint(chapter_dir, filenames, tile_size):
+    """
+    Hash of the chapter's card file contents and tile size; a new hash means a new atlas file.
+    Contents rather than modification times, so a re-download of identical images keeps the atlas name.
+    """
+    digest = hashlib.sha1(f"{tile_size}".encode())
+    for filename in filenames:
+        digest.update(f"{filename}:{_file_digest(os.path.join(chapter_dir, filename))}".encode())
+    return digest.hexdigest()[:12]
+
+
+def _remove_superseded_atlases(atlas_dir, chapter, atlas_name):
+    """Delete the atlases of a chapter built under an older fingerprint."""
+    superseded = re.compile(rf"{re.escape(chapter)}_[0-9a-f]{{12}}\.(webp|json)")
+    for filename in os.listdir(atlas_dir):
+        if superseded.fullmatch(filename) and os.path.splitext(filename)[0] != atlas_name:
+            os.remove(os.path.join(atlas_dir, filename))
+
+
+def chapter_atlas(lang, chapter, chapter_dir, card_size, load_tile, output_dir=OUTPUT_DIR):
+    """
+    Return the sprite atlas of a chapter, building it if the card files changed.
+    The atlas holds every card of the chapter without any collection state, so it can be cached indefinitely.
+    load_tile(img_path, tile_size) returns the finished RGBA tile for one card.
+    Result: {"image": path relative to output_dir, "size": [w, h], "tile_size": [w, h], "cells": {card_key: [x, y]}}
+    """
+    filenames = _chapter_files(chapter_dir)
+    tile_size = (int(card_size[0] * ATLAS_SCALE), int(card_size[1] * ATLAS_SCALE))
+    fingerprint = _atlas_fingerprint(chapter_dir, filenames, tile_size)
+    atlas_dir = os.path.join(output_dir, ATLAS_SUBDIR, lang)
+    atlas_name = f"{chapter}_{fingerprint}"
+    index_path = os.path.join(atlas_dir, f"{atlas_name}.json")
+
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as index_file:
+            return json.load(index_file)
+
+    from PIL import Image
+
+    # Roughly square atlas
+    columns = max(1, math.ceil(math.sqrt(len(filenames) * tile_size[1] / tile_size[0])))
+    rows = max(1, math.ceil(len(filenames) / columns))
+    atlas_image = Image.new('RGBA', (columns * tile_size[0], rows * tile_size[1]), (0, 0, 0, 0))
+    cells = {}
+    for index, filename in enumerate(filenames):
+        x, y = (index % columns) * tile_size[0], (index // columns) * tile_size[1]
+        tile = load_tile(os.path.join(chapter_dir, filename), tile_size)
+        if tile is None: continue
+        atlas_image.paste(tile, (x, y))
+        cells[filename.split("_")[0]] = [x, y]
+
+    os.makedirs(atlas_dir, exist_ok=True)
+    atlas_image.save(os.path.join(atlas_dir, f"{atlas_name}.webp"), "WebP", quality=ATLAS_QUALITY)
+    atlas = {
+        "image": f"{ATLAS_SUBDIR}/{lang}/{atlas_name}.webp",
+        "size": list(atlas_image.size),
+        "tile_size": list(tile_size),
+        "cells": cells,
+    }
+    with open(index_path, 'w', encoding='utf-8') as index_file:
+        json.dump(atlas, index_file, separators=(',', ':'))
+    _remove_superseded_atlases(atlas_dir, chapter, atlas_name)
+    print(f"Atlas saved: {os.path.join(atlas_dir, atlas_name)}.webp ({len(cells)} cards)")
+    return atlas
+
+
+def save_view_manifest(manifest_path, manifest):
+    """Write a view manifest as compact JSON."""
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, ensure_ascii=False, separators=(',', ':'))
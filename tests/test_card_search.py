@@ -0,0 +1,26 @@
+from card_search import build_card_index, parse_query, search_cards
+
+
+def _index(documents):
+    index = build_card_index(documents)
+    index["postings"] = {field: {value: frozenset(ids) for value, ids in values.items()} for field, values in index["postings"].items()}
+    index["all"] = frozenset(index["cards"])
+    return index
+
+
+INDEX = _index({
+    "001/001": {"name": "Ariel", "text": "Singer", "set": "001", "color": ["amber"], "ink_cost": 3},
+    "002/005": {"name": "Belle", "text": "", "set": "002", "color": ["sapphire"], "ink_cost": 5},
+    "P1/0001": {"name": "Stitch", "text": "", "set": "P1", "color": ["amber"], "ink_cost": 2},
+})
+
+
+def test_empty_terms_are_skipped():
+    assert parse_query("- set: name:") == []
+    assert search_cards(INDEX, "color:amber -") == {("001", "001"), ("P1", "0001")}
+    assert search_cards(INDEX, "set: ink_cost>=3") == {("001", "001"), ("002", "005")}
+
+
+def test_numeric_set_codes_are_zero_padded():
+    assert search_cards(INDEX, "set:1") == {("001", "001")}
+    assert search_cards(INDEX, "set:2,p1") == {("002", "005"), ("P1", "0001")}
@@ -0,0 +1,18 @@
+from card_collection import CardCollection
+from collection_stats import collection_to_arrays, compute_collection_stats
+
+
+def test_enchanted_multicolor_card_counted_once_in_set_and_overall_totals():
+    collection = CardCollection({"001": {
+        "205": {"color": ["Amber", "Steel"], "rarity": "ENCHANTED", "multicolor": True, "normal": 1, "foil": 0},
+        "120": {"color": ["Ruby"], "rarity": "COMMON", "multicolor": False, "normal": 0, "foil": 0},
+    }})
+    stats = compute_collection_stats(collection_to_arrays(collection))
+
+    expected = {"cards": 2, "owned": 1, "normal": 1, "multicolor": 1}
+    for totals in (stats["totals"]["set"]["001"], stats["overall"]):
+        assert {name: totals[name] for name in expected} == expected
+    assert stats["totals"]["rarity"]["ENCHANTED"]["cards"] == 1
+    # The color breakdown still shows the card under both of its colors
+    assert stats["totals"]["color"]["amber"]["owned"] == 1
+    assert stats["totals"]["color"]["steel"]["owned"] == 1